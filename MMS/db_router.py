@@ -0,0 +1,64 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Set for requests that write, so their reads see their own writes instead of a lagging replica.
+_pinned_to_primary = ContextVar('pinned_to_primary', default=False)
+
+
+class PrimaryReplicaRouter:
+    """Send reads to a random replica (unless pinned to the primary) and everything else to default"""
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or _pinned_to_primary.get():
+            return 'default'
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+@contextmanager
+def read_from_primary():
+    """
+    Send the block's reads to the primary, e.g. to refill a cache entry that was just
+    invalidated: a lagging replica would store the old data under the new version.
+    """
+    token = _pinned_to_primary.set(True)
+    try:
+        yield
+    finally:
+        _pinned_to_primary.reset(token)
+
+
+@sync_and_async_middleware
+def primary_pinning_middleware(get_response):
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = _pinned_to_primary.set(request.method not in SAFE_METHODS)
+            try:
+                return await get_response(request)
+            finally:
+                _pinned_to_primary.reset(token)
+    else:
+        def middleware(request):
+            token = _pinned_to_primary.set(request.method not in SAFE_METHODS)
+            try:
+                return get_response(request)
+            finally:
+                _pinned_to_primary.reset(token)
+    return middleware
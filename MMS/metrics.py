@@ -0,0 +1,204 @@
+import random
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.decorators import sync_and_async_middleware
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# The sample for the request being handled, or None when it is not sampled.
+_sample = ContextVar('perf_sample', default=None)
+
+
+class RequestSample:
+    """SQL and phase timings for one request"""
+    __slots__ = ('queries', 'sql_seconds', 'phases')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.phases = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_seconds += perf_counter() - start
+
+
+@contextmanager
+def timed(phase):
+    """Add the block's duration to `phase` (e.g. 'serialize') on the current sampled request"""
+    sample = _sample.get()
+    if sample is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        sample.phases[phase] = sample.phases.get(phase, 0.0) + perf_counter() - start
+
+
+class MetricsRegistry:
+    """Per-process aggregates, keyed by (view, method)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def reset(self):
+        with self._lock:
+            self._views = {}
+
+    def observe(self, view, method, status_code, duration, sample, response_bytes):
+        with self._lock:
+            stats = self._views.get((view, method))
+            if stats is None:
+                stats = self._views[view, method] = {
+                    'statuses': {}, 'buckets': [0] * len(DURATION_BUCKETS), 'count': 0, 'seconds': 0.0,
+                    'queries': 0, 'sql_seconds': 0.0, 'phases': {}, 'bytes': 0,
+                }
+            stats['statuses'][status_code] = stats['statuses'].get(status_code, 0) + 1
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    stats['buckets'][index] += 1
+            stats['count'] += 1
+            stats['seconds'] += duration
+            stats['queries'] += sample.queries
+            stats['sql_seconds'] += sample.sql_seconds
+            for phase, seconds in sample.phases.items():
+                stats['phases'][phase] = stats['phases'].get(phase, 0.0) + seconds
+            stats['bytes'] += response_bytes
+
+    def render(self):
+        """Prometheus text exposition format"""
+        with self._lock:
+            views = sorted(self._views.items())
+            lines = [
+                '# HELP mms_requests_total Sampled requests.',
+                '# TYPE mms_requests_total counter',
+            ]
+            for (view, method), stats in views:
+                for status_code, count in sorted(stats['statuses'].items()):
+                    lines.append(f'mms_requests_total{{view="{view}",method="{method}",status="{status_code}"}} {count}')
+
+            lines += [
+                '# HELP mms_request_duration_seconds Wall time spent in the middleware stack.',
+                '# TYPE mms_request_duration_seconds histogram',
+            ]
+            for (view, method), stats in views:
+                labels = f'view="{view}",method="{method}"'
+                for bound, count in zip(DURATION_BUCKETS, stats['buckets']):
+                    lines.append(f'mms_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'mms_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats["count"]}')
+                lines.append(f'mms_request_duration_seconds_sum{{{labels}}} {stats["seconds"]:.6f}')
+                lines.append(f'mms_request_duration_seconds_count{{{labels}}} {stats["count"]}')
+
+            for name, key, help_text in [
+                ('mms_sql_queries_total', 'queries', 'SQL queries executed.'),
+                ('mms_sql_duration_seconds_total', 'sql_seconds', 'Time spent executing SQL.'),
+                ('mms_response_bytes_total', 'bytes', 'Response body bytes, excluding streamed responses.'),
+            ]:
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                for (view, method), stats in views:
+                    lines.append(f'{name}{{view="{view}",method="{method}"}} {round(stats[key], 6)}')
+
+            lines += [
+                '# HELP mms_phase_duration_seconds_total Time spent in named phases such as serialize and render.',
+                '# TYPE mms_phase_duration_seconds_total counter',
+            ]
+            for (view, method), stats in views:
+                for phase, seconds in sorted(stats['phases'].items()):
+                    lines.append(f'mms_phase_duration_seconds_total{{view="{view}",method="{method}",phase="{phase}"}} {seconds:.6f}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def _start_sample():
+    rate = settings.PERF_METRICS_SAMPLE_RATE
+    if rate <= 0 or (rate < 1 and random.random() >= rate):
+        return None
+    return RequestSample()
+
+
+def _finish_sample(request, response, sample, duration):
+    match = request.resolver_match
+    view = match.url_name if match is not None and match.url_name else 'unmatched'
+    response_bytes = 0 if response.streaming else len(response.content)
+    registry.observe(view, request.method, response.status_code, duration, sample, response_bytes)
+
+    timings = [f'total;dur={duration * 1000:.2f}', f'sql;dur={sample.sql_seconds * 1000:.2f};desc="queries={sample.queries}"']
+    timings += [f'{phase};dur={seconds * 1000:.2f}' for phase, seconds in sample.phases.items()]
+    response['Server-Timing'] = ', '.join(timings)
+
+
+def _record_query(execute, sql, params, many, context):
+    sample = _sample.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    return sample(execute, sql, params, many, context)
+
+
+def _instrument_connections():
+    """
+    Install _record_query on this thread's connections; it stays for their lifetime. It finds
+    the sample through the context, which sync_to_async copies into its worker thread, so an
+    async view's ORM calls are counted against the request that made them.
+    """
+    for connection in connections.all():
+        if _record_query not in connection.execute_wrappers:
+            connection.execute_wrappers.append(_record_query)
+
+
+@sync_and_async_middleware
+def performance_middleware(get_response):
+    """Time sampled requests, count their SQL and report them via /metrics/ and Server-Timing"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            sample = _start_sample()
+            if sample is None:
+                return await get_response(request)
+            token = _sample.set(sample)
+            started = perf_counter()
+            try:
+                # Thread-sensitive, so it runs on the thread the request's ORM calls will use
+                await sync_to_async(_instrument_connections)()
+                response = await get_response(request)
+            finally:
+                _sample.reset(token)
+            _finish_sample(request, response, sample, perf_counter() - started)
+            return response
+    else:
+        def middleware(request):
+            sample = _start_sample()
+            if sample is None:
+                return get_response(request)
+            token = _sample.set(sample)
+            started = perf_counter()
+            try:
+                _instrument_connections()
+                response = get_response(request)
+            finally:
+                _sample.reset(token)
+            _finish_sample(request, response, sample, perf_counter() - started)
+            return response
+    return middleware
+
+
+def metrics_view(request):
+    token = settings.PERF_METRICS_TOKEN
+    # Closed until a token is configured
+    if not token or request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
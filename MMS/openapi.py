@@ -0,0 +1,190 @@
+import gzip
+import hashlib
+import os
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.urls import URLResolver, get_resolver
+from django.utils.http import parse_etags
+from django.utils.module_loading import import_string
+from django.views.decorators.http import require_GET
+
+# format name -> content type, matching SpectacularAPIView's renderers
+SCHEMA_FORMATS = {
+    'yaml': 'application/vnd.oai.openapi',
+    'json': 'application/vnd.oai.openapi+json',
+}
+
+# The current key's rendered schemas: {format: (content, gzipped content)}
+_cache = {'key': None, 'schemas': {}}
+_build_lock = threading.Lock()
+_keys = {}
+
+
+def lazy_view(import_path, **initkwargs):
+    """URLconf entry that imports its class-based view on first use instead of at startup"""
+    view = None
+
+    def dispatch(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view = import_string(import_path).as_view(**initkwargs)
+        return view(request, *args, **kwargs)
+
+    dispatch.import_path = import_path
+    return dispatch
+
+
+def _url_entries(resolver, prefix=''):
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            yield from _url_entries(pattern, prefix + str(pattern.pattern))
+            continue
+        callback = pattern.callback
+        view = getattr(callback, 'cls', None) or getattr(callback, 'view_class', None)
+        target = getattr(callback, 'import_path', None) or (f'{view.__module__}.{view.__qualname__}' if view
+                                                             else f'{callback.__module__}.{callback.__qualname__}')
+        actions = sorted((getattr(callback, 'actions', None) or {}).items())
+        yield f'{prefix}{pattern.pattern} {pattern.name} {target} {actions}'
+
+
+def schema_key():
+    """Hash of the app version and every route; a deploy that changes either gets a new schema"""
+    version = f'{settings.APP_VERSION}\n{settings.SPECTACULAR_SETTINGS.get("VERSION")}'
+    # get_resolver() is itself cached per URLconf, so this walks the routes once per process
+    resolver = get_resolver(settings.ROOT_URLCONF)
+    if (resolver, version) not in _keys:
+        digest = hashlib.sha256(version.encode())
+        for entry in _url_entries(resolver):
+            digest.update(f'\n{entry}'.encode())
+        _keys[(resolver, version)] = digest.hexdigest()[:20]
+    return _keys[(resolver, version)]
+
+
+def uses_schema_files():
+    """
+    The key only tracks the release and the routes, not the source, so files are shared only
+    for a named release; without APP_VERSION (e.g. in development) each worker builds its own.
+    """
+    return bool(settings.APP_VERSION)
+
+
+def schema_path(key, schema_format, compressed=False):
+    return settings.OPENAPI_SCHEMA_DIR / f'openapi-{key}.{schema_format}{".gz" if compressed else ""}'
+
+
+def build_schema():
+    """Render the OpenAPI document in every format; imports drf_spectacular only when called"""
+    from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+    from drf_spectacular.settings import spectacular_settings
+
+    import users.schema  # noqa: F401  registers the authentication extension
+
+    schema = spectacular_settings.DEFAULT_GENERATOR_CLASS().get_schema(request=None, public=True)
+    return {
+        'yaml': OpenApiYamlRenderer().render(schema, renderer_context={}),
+        'json': OpenApiJsonRenderer().render(schema, renderer_context={}),
+    }
+
+
+def compressed_schemas():
+    return {schema_format: (content, gzip.compress(content, mtime=0))
+            for schema_format, content in build_schema().items()}
+
+
+def write_schema(key=None):
+    """Generate the schema files for key, with gzipped copies alongside"""
+    key = key or schema_key()
+    schemas = compressed_schemas()
+    settings.OPENAPI_SCHEMA_DIR.mkdir(parents=True, exist_ok=True)
+    for schema_format, (content, compressed) in schemas.items():
+        # Write then rename, so concurrent readers never see a partial file
+        for path, data in [(schema_path(key, schema_format), content), (schema_path(key, schema_format, True), compressed)]:
+            partial = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+            partial.write_bytes(data)
+            partial.replace(path)
+    _cache.update(key=key, schemas=schemas)
+    return key, schemas
+
+
+def prune_schemas(key):
+    """Delete files cached for other keys, once no worker of an older release can need them"""
+    stale = [path for path in settings.OPENAPI_SCHEMA_DIR.glob('openapi-*') if not path.name.startswith(f'openapi-{key}.')]
+    for path in stale:
+        path.unlink(missing_ok=True)
+    return stale
+
+
+def _read_schemas(key):
+    schemas = {}
+    for schema_format in SCHEMA_FORMATS:
+        try:
+            schemas[schema_format] = (schema_path(key, schema_format).read_bytes(),
+                                      schema_path(key, schema_format, True).read_bytes())
+        except FileNotFoundError:
+            return None
+    return schemas
+
+
+def get_schemas():
+    """
+    (key, {format: (content, gzipped)}) for the current key: from memory, then from the files
+    `manage.py generate_schema` wrote, and only generated here when neither has it.
+    """
+    key = schema_key()
+    if _cache['key'] != key:
+        with _build_lock:
+            # Swagger UI and Redoc fetch together on a cold worker; build once
+            if _cache['key'] != key:
+                schemas = _read_schemas(key) if uses_schema_files() else compressed_schemas()
+                if schemas is None:
+                    write_schema(key)
+                else:
+                    _cache.update(key=key, schemas=schemas)
+    return _cache['key'], _cache['schemas']
+
+
+def requested_format(request):
+    schema_format = request.GET.get('format')
+    if schema_format in ['json', 'openapi-json']:
+        return 'json'
+    if schema_format in ['yaml', 'openapi']:
+        return 'yaml'
+    return 'json' if 'json' in request.headers.get('Accept', '') else 'yaml'
+
+
+def accepts_gzip(request):
+    """Whether Accept-Encoding allows gzip, honouring q-values (gzip;q=0 refuses it)"""
+    qualities = {}
+    for coding in request.headers.get('Accept-Encoding', '').split(','):
+        name, *params = [part.strip() for part in coding.split(';')]
+        quality = 1.0
+        for param in params:
+            if param.lower().startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        qualities[name.lower()] = quality
+    return qualities.get('gzip', qualities.get('*', 0.0)) > 0
+
+
+@require_GET
+def schema_view(request):
+    schema_format = requested_format(request)
+    key, schemas = get_schemas()
+    etag = f'"{key}-{schema_format}"'
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        content, compressed = schemas[schema_format]
+        if accepts_gzip(request):
+            response = HttpResponse(compressed, content_type=SCHEMA_FORMATS[schema_format])
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(content, content_type=SCHEMA_FORMATS[schema_format])
+    response['ETag'] = etag
+    response['Cache-Control'] = f'public, max-age={settings.OPENAPI_SCHEMA_MAX_AGE}'
+    response['Vary'] = 'Accept, Accept-Encoding'
+    return response
@@ -0,0 +1,88 @@
+import logging
+import re
+import traceback
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%s|\?")
+_IN_LISTS = re.compile(r'\bIN \((?:\?, )*\?\)')
+
+
+def query_shape(sql):
+    """SQL with its literals and parameters replaced, so per-row repeats of a query compare equal"""
+    return _IN_LISTS.sub('IN (...)', _LITERALS.sub('?', sql))
+
+
+def _project_stack():
+    # Frames from our own code only; Django and DRF internals are the same for every query.
+    root = str(settings.BASE_DIR)
+    return [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(root) and 'site-packages' not in frame.filename and frame.filename != __file__
+    ]
+
+
+class QueryRecorder:
+    """Connection execute_wrapper that keeps every query with the project stack that issued it"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((sql, _project_stack()))
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def repeated(self, threshold):
+        """[(shape, count, stack of the first occurrence)] for shapes run at least threshold times"""
+        shapes = defaultdict(list)
+        for sql, stack in self.queries:
+            shapes[query_shape(sql)].append(stack)
+        return [(shape, len(stacks), stacks[0]) for shape, stacks in shapes.items() if len(stacks) >= threshold]
+
+    def report(self, threshold=None):
+        lines = [f'{len(self.queries)} queries:']
+        lines += [f'  {index}. {sql}' for index, (sql, _) in enumerate(self.queries, 1)]
+        for shape, count, stack in self.repeated(threshold) if threshold else []:
+            lines.append(f'Repeated {count} times: {shape}')
+            lines += ['  ' + line.rstrip() for line in traceback.format_list(stack)]
+        return '\n'.join(lines)
+
+
+@contextmanager
+def record_queries():
+    recorder = QueryRecorder()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        yield recorder
+
+
+def nplusone_middleware(get_response):
+    """
+    Development aid: log the repeated query shapes of each request with the code that issued
+    them, or raise when NPLUSONE_RAISE is set. Removed from the stack unless NPLUSONE_DETECTION is on.
+    """
+    if not getattr(settings, 'NPLUSONE_DETECTION', False):
+        raise MiddlewareNotUsed
+
+    def middleware(request):
+        with record_queries() as recorder:
+            response = get_response(request)
+        repeated = recorder.repeated(settings.NPLUSONE_THRESHOLD)
+        if repeated:
+            message = f'N+1 queries in {request.method} {request.path}\n{recorder.report(settings.NPLUSONE_THRESHOLD)}'
+            if settings.NPLUSONE_RAISE:
+                raise AssertionError(message)
+            logger.warning(message)
+        return response
+
+    return middleware
@@ -9,6 +9,7 @@ https://docs.djangoproject.com/en/5.1/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
+import os
 from datetime import timedelta
 from pathlib import Path
 
@@ -27,25 +28,54 @@ DEBUG = True
 
 ALLOWED_HOSTS = []
 
+# Sliding-window limits on the unauthenticated endpoints (users.utils.throttling), as
+# requests per second/min/hour/day. THROTTLING=false turns them off, e.g. for load tests.
+THROTTLING = os.environ.get('THROTTLING', 'true').lower() in ['1', 'true']
+
 # REST_FRAMEWORK Setting
 AUTH_USER_MODEL = 'users.UserProfile'
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.utils.authentication.StatelessJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     'EXCEPTION_HANDLER': 'users.utils.custom_exception_handler',
+    'DEFAULT_RENDERER_CLASSES': [
+        'users.utils.renderers.EnvelopeJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'users.utils.renderers.EnvelopeJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    # Reverse proxies in front of the app. X-Forwarded-For is client-controlled, so it is only
+    # used for throttling when this many proxies are declared; otherwise REMOTE_ADDR is.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '30/min',
+        'login_username': '10/min',
+        'register_ip': '20/hour',
+    } if THROTTLING else {},
 }
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),  # Set access token expiry time
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),     # Set refresh token expiry time
     'ROTATE_REFRESH_TOKENS': True,                  # Optional: Rotate refresh tokens on refresh
     'BLACKLIST_AFTER_ROTATION': True,               # Optional: Blacklist rotated tokens
+    'TOKEN_OBTAIN_SERIALIZER': 'users.serializers.token_serializer.MemberTokenObtainPairSerializer',
 }
 
+# Release identifier, e.g. the deployed commit; part of the OpenAPI schema cache key. Unset, /schema/
+# is built in memory by each worker instead of read from the generate_schema files.
+APP_VERSION = os.environ.get('APP_VERSION', '')
+# Where `manage.py generate_schema` writes the OpenAPI document served at /schema/
+OPENAPI_SCHEMA_DIR = Path(os.environ.get('OPENAPI_SCHEMA_DIR', BASE_DIR / 'openapi'))
+OPENAPI_SCHEMA_MAX_AGE = 60 * 60
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Mess Management System API',
     'DESCRIPTION': 'API documentation for the Mess Management System',
@@ -85,6 +115,7 @@ EXTERNAL_APPS = [
 INSTALLED_APPS += EXTERNAL_APPS
 
 MIDDLEWARE = [
+    'MMS.metrics.performance_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -93,7 +124,29 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'MMS.db_router.primary_pinning_middleware',
+    'MMS.query_inspector.nplusone_middleware',
 ]
+# Fraction of requests timed by MMS.metrics.performance_middleware; 0 turns it off entirely.
+PERF_METRICS_SAMPLE_RATE = float(os.environ.get('PERF_METRICS_SAMPLE_RATE', '0.01'))
+# Bearer token Prometheus must send to read /metrics/; unset keeps the endpoint closed.
+PERF_METRICS_TOKEN = os.environ.get('PERF_METRICS_TOKEN')
+
+# Development check for per-row queries; the middleware removes itself when this is off.
+NPLUSONE_DETECTION = DEBUG and os.environ.get('NPLUSONE_DETECTION', '').lower() in ['1', 'true']
+NPLUSONE_THRESHOLD = 5  # executions of one query shape in a request that count as N+1
+NPLUSONE_RAISE = False  # raise instead of logging a warning
+
+# Background tasks (users.utils.task_queue), run by `manage.py run_tasks` worker processes
+TASK_MAX_ATTEMPTS = 5
+TASK_RETRY_BASE_DELAY = 10  # seconds before the first retry; doubles per attempt
+TASK_RETRY_MAX_DELAY = 60 * 60
+TASK_LEASE_SECONDS = 5 * 60  # a running task whose worker went quiet this long is retried
+TASK_RESULT_TTL = timedelta(days=7)  # finished tasks kept for inspection before --purge removes them
+
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'no-reply@mms.local')
+
 CORS_ALLOWED_ORIGINS = [
     'http://localhost:57695',  # Replace with your Flutter app's debug port
     'http://127.0.0.1:1234',
@@ -118,17 +171,98 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'MMS.wsgi.application'
+ASGI_APPLICATION = 'MMS.asgi.application'
+# Route the users API to its async views; enable when serving MMS.asgi with uvicorn or daphne.
+ASYNC_USER_VIEWS = os.environ.get('ASYNC_USER_VIEWS', '').lower() in ['1', 'true']
 
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DATABASE_ENGINE=postgresql switches to PostgreSQL with persistent connections (or a psycopg
+# pool when DATABASE_POOL_MAX_SIZE is set) and one replica alias per DATABASE_REPLICA_HOSTS entry.
+# Otherwise SQLite runs in WAL mode so readers don't block the writer, with a busy timeout
+# instead of failing fast with "database is locked".
+
+DATABASE_ENGINE = os.environ.get('DATABASE_ENGINE', 'sqlite')
+
+if DATABASE_ENGINE == 'postgresql':
+    DATABASE_POOL_MAX_SIZE = int(os.environ.get('DATABASE_POOL_MAX_SIZE', 0))
+    _primary = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('DATABASE_NAME', 'mms'),
+        'USER': os.environ.get('DATABASE_USER', 'mms'),
+        'PASSWORD': os.environ.get('DATABASE_PASSWORD', ''),
+        'HOST': os.environ.get('DATABASE_HOST', 'localhost'),
+        'PORT': os.environ.get('DATABASE_PORT', '5432'),
+        # Pooled connections are returned to the pool after each request, so they can't also be persistent.
+        'CONN_MAX_AGE': 0 if DATABASE_POOL_MAX_SIZE else int(os.environ.get('DATABASE_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pool': {'min_size': 2, 'max_size': DATABASE_POOL_MAX_SIZE},
+        } if DATABASE_POOL_MAX_SIZE else {},
     }
+    DATABASES = {'default': _primary}
+    for index, host in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_HOSTS', '').split(','))):
+        DATABASES[f'replica_{index}'] = {**_primary, 'HOST': host.strip(), 'TEST': {'MIRROR': 'default'}}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DATABASE_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+            },
+        }
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['MMS.db_router.PrimaryReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# A shared Redis cache when CACHE_URL is set, otherwise a per-process local-memory cache.
+
+CACHE_URL = os.environ.get('CACHE_URL')
+THROTTLE_CACHE_URL = os.environ.get('THROTTLE_CACHE_URL', CACHE_URL)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_URL,
+    } if CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # Throttle counters; shared between workers through Redis when THROTTLE_CACHE_URL or
+    # CACHE_URL is set. The local-memory fallback culls old entries, bounding memory under attack.
+    'throttle': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': THROTTLE_CACHE_URL,
+    } if THROTTLE_CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'throttle',
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
 }
+RANK_CACHE_LOCAL_TTL = 5  # seconds a process trusts its in-memory rank snapshot before re-checking the version
+
+# Without CACHE_URL each worker process has its own cache, so an invalidation only reaches the
+# worker that made it. Invalidation-dependent entries then expire after LOCAL_CACHE_TIMEOUT
+# seconds instead, which bounds how long other workers act on stale data.
+LOCAL_CACHE_TIMEOUT = 5
+# Seconds a cached token version is trusted. This is how long a role change, deactivation or
+# delete can take to revoke outstanding tokens on workers that don't share the cache.
+TOKEN_VERSION_CACHE_TIMEOUT = 60 * 60 if CACHE_URL else LOCAL_CACHE_TIMEOUT
+# Lifetime of the rank cache version and snapshots; rank creates, renames and deletes reach
+# workers that don't share the cache once these expire.
+RANK_CACHE_TIMEOUT = None if CACHE_URL else LOCAL_CACHE_TIMEOUT
+# Lifetime of cached profile/listing payloads and of the versions their ETags derive from.
+# Updates and approvals bump the versions, which only reaches other workers through a shared cache.
+RESPONSE_CACHE_TIMEOUT = 60 * 60 if CACHE_URL else LOCAL_CACHE_TIMEOUT
+RESPONSE_CACHE_VERSION_TIMEOUT = None if CACHE_URL else LOCAL_CACHE_TIMEOUT
 
 
 # Password validation
@@ -150,6 +284,28 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/5.1/topics/auth/passwords/
+# PASSWORD_HASHER picks the algorithm for new hashes. The others stay listed so existing
+# hashes still verify and are re-hashed with the preferred one on the user's next login.
+# Argon2 requires the argon2-cffi package.
+
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'pbkdf2')
+PASSWORD_HASHER_CLASSES = {
+    'pbkdf2': 'users.utils.hashers.TunablePBKDF2PasswordHasher',
+    'argon2': 'users.utils.hashers.TunableArgon2PasswordHasher',
+    'scrypt': 'users.utils.hashers.TunableScryptPasswordHasher',
+}
+PASSWORD_HASHERS = [PASSWORD_HASHER_CLASSES[PASSWORD_HASHER]] + [
+    path for name, path in PASSWORD_HASHER_CLASSES.items() if name != PASSWORD_HASHER
+] + ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
+# Per-algorithm cost overrides, e.g. {'pbkdf2': {'iterations': 600000}, 'scrypt': {'work_factor': 2 ** 15}}.
+# Unset values fall back to Django's defaults.
+PASSWORD_HASHER_PARAMS = {}
+PASSWORD_HASH_THREADS = 4  # bounded thread pool used by async views to hash off the event loop
+PASSWORD_HASH_WORKERS = None  # processes used by bulk imports, None means one per CPU
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.urls import path, include
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
+
+from MMS.metrics import metrics_view
+from MMS.openapi import lazy_view, schema_view
 
 urlpatterns = [
     # Admin panel
@@ -9,8 +11,12 @@ urlpatterns = [
     # App URLs
     path('', include(('users.urls', 'users'), namespace='users')),
 
-    # Swagger/OpenAPI URLs
-    path('schema/', SpectacularAPIView.as_view(), name='schema'),  # Generates the schema
-    path('schema/swagger-ui/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),  # Swagger UI
-    path('schema/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),  # Redoc UI
+    # Prometheus scrape endpoint
+    path('metrics/', metrics_view, name='metrics'),
+
+    # Swagger/OpenAPI URLs. The schema is served pre-generated (manage.py generate_schema), and the
+    # doc UIs import drf_spectacular on first use, so none of it is loaded when a worker boots.
+    path('schema/', schema_view, name='schema'),
+    path('schema/swagger-ui/', lazy_view('drf_spectacular.views.SpectacularSwaggerView', url_name='schema'), name='swagger-ui'),
+    path('schema/redoc/', lazy_view('drf_spectacular.views.SpectacularRedocView', url_name='schema'), name='redoc'),
 ]
\ No newline at end of file
@@ -1,8 +1,88 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import ORDER_VAR, PAGE_VAR
 from django.contrib.auth.admin import UserAdmin
 
+from .managers.managers import APPROVED
 from .models import UserProfile
+from .models.member_stat_model import MemberStat
 from .models.user_rank_model import UserRank
+from .utils import member_stats
+from .utils.pagination import EstimatedCountPaginator
+from .utils.rank_cache import get_ranks
+
+
+def member_counts(request):
+    # One MemberStat read per changelist, shared by the filters and the paginator.
+    if not hasattr(request, '_member_counts'):
+        request._member_counts = member_stats.stored_counts()
+    return request._member_counts
+
+
+class MemberStatFilter(admin.SimpleListFilter):
+    """List filter whose choices are MemberStat buckets, labelled with their stored counts"""
+    dimension = None
+    field = None  # column matched against the selected bucket key
+    options = []  # (bucket key, label) pairs
+
+    def get_options(self, request):
+        return self.options
+
+    def filter_kwargs(self, key):
+        return {self.field: key}
+
+    def lookups(self, request, model_admin):
+        counts = member_counts(request)
+        return [(key, f'{label} ({counts.get((self.dimension, key), 0)})') for key, label in self.get_options(request)]
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        return queryset.filter(**self.filter_kwargs(self.value()))
+
+
+class RoleFilter(MemberStatFilter):
+    title = 'role'
+    parameter_name = 'role'
+    dimension = MemberStat.ROLE
+    field = 'role'
+    options = UserProfile.ROLE_CHOICES
+
+
+class RankFilter(MemberStatFilter):
+    title = 'rank'
+    parameter_name = 'rank'
+    dimension = MemberStat.RANK
+    field = 'rank_id'
+
+    def get_options(self, request):
+        ranks = [(str(rank_id), rank['name']) for rank_id, rank in get_ranks().items()]
+        return [*ranks, (member_stats.NO_RANK, 'No rank')]
+
+    def filter_kwargs(self, key):
+        if key == member_stats.NO_RANK:
+            return {'rank__isnull': True}
+        return super().filter_kwargs(key)
+
+
+class ApprovalFilter(MemberStatFilter):
+    title = 'approval'
+    parameter_name = 'approval'
+    dimension = MemberStat.APPROVAL
+    field = 'is_approved'
+    options = [(member_stats.APPROVED, 'Approved'), (member_stats.PENDING, 'Pending')]
+
+    def filter_kwargs(self, key):
+        return {self.field: key == member_stats.APPROVED}
+
+
+def role_action(role, label):
+    @admin.action(description=f'Change role of selected members to {label}', permissions=['change'])
+    def change_role(modeladmin, request, queryset):
+        changed = UserProfile.objects.change_role(role, pk__in=queryset.values('pk'))
+        modeladmin.message_user(request, f'{len(changed)} member(s) changed to {label}.', messages.SUCCESS)
+
+    change_role.__name__ = f'make_{role}'
+    return change_role
 
 
 @admin.register(UserRank)
@@ -14,9 +94,22 @@ class RankAdmin(admin.ModelAdmin):
 @admin.register(UserProfile)
 class UserProfileAdmin(UserAdmin):
     model = UserProfile
-    list_display = ['id', 'email', 'username', 'password', 'role', 'phone', 'full_name', 'rank', 'is_approved']
-    search_fields = ['email', 'username', 'full_name']
-    ordering = ['email']
+    list_display = ['id', 'email', 'username', 'role', 'phone', 'full_name', 'rank', 'is_approved']
+    list_select_related = ['rank']
+    list_filter = [RoleFilter, RankFilter, ApprovalFilter]
+    # Prefix matches, served by the trigram indexes from 0007 on PostgreSQL
+    search_fields = ['^email', '^username', '^full_name']
+    search_help_text = 'Email, username or full name starting with the search term'
+    # Newest first along the primary key; only unique, indexed columns are sortable.
+    ordering = ['-id']
+    sortable_by = ['id', 'email', 'username']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+    actions = [
+        'approve_selected',
+        *[role_action(role, label) for role, label in UserProfile.ROLE_CHOICES],
+    ]
 
     fieldsets = (
         (None, {'fields': ('username', 'email', 'password')}),
@@ -31,3 +124,22 @@ class UserProfileAdmin(UserAdmin):
         }),
     )
 
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        return self.paginator(queryset, per_page, orphans, allow_empty_first_page, count=self.stored_count(request))
+
+    def stored_count(self, request):
+        """Row count from MemberStat when the changelist shows everyone or a single bucket, else None"""
+        params = {key: value for key, value in request.GET.items() if key not in (PAGE_VAR, ORDER_VAR)}
+        if not params:
+            return member_stats.member_total(member_counts(request))
+        if len(params) == 1:
+            for list_filter in self.list_filter:
+                if list_filter.parameter_name in params:
+                    return member_counts(request).get((list_filter.dimension, params[list_filter.parameter_name]))
+        return None
+
+    @admin.action(description='Approve selected members', permissions=['change'])
+    def approve_selected(self, request, queryset):
+        outcomes = UserProfile.objects.approve_members(pk__in=queryset.values('pk'))
+        approved = sum(outcome == APPROVED for outcome in outcomes.values())
+        self.message_user(request, f'{approved} member(s) approved.', messages.SUCCESS)
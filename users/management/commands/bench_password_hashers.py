@@ -0,0 +1,56 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+
+class Command(BaseCommand):
+    help = 'Measure password verifications (logins) per second per worker for each configured hasher'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=20, help='Verifications per hasher')
+        parser.add_argument('--threads', type=int, default=getattr(settings, 'PASSWORD_HASH_THREADS', 4))
+        parser.add_argument('--json', action='store_true', help='Print machine-readable results')
+
+    def handle(self, *args, **options):
+        results = []
+        for name, path in settings.PASSWORD_HASHER_CLASSES.items():
+            hasher = import_string(path)()
+            try:
+                encoded = hasher.encode('benchmark-password', hasher.salt())
+            except ValueError as e:
+                results.append({'hasher': name, 'error': str(e)})
+                continue
+
+            started = time.perf_counter()
+            hasher.verify('benchmark-password', encoded)
+            single = time.perf_counter() - started
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+                list(pool.map(lambda _: hasher.verify('benchmark-password', encoded), range(options['logins'])))
+            elapsed = time.perf_counter() - started
+
+            results.append({
+                'hasher': name,
+                'preferred': name == settings.PASSWORD_HASHER,
+                'verify_ms': round(single * 1000, 2),
+                'threads': options['threads'],
+                'logins_per_sec': round(options['logins'] / elapsed, 2),
+            })
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for result in results:
+            if 'error' in result:
+                self.stdout.write(f"{result['hasher']:<8} unavailable: {result['error']}")
+            else:
+                self.stdout.write(
+                    f"{result['hasher']:<8} {result['verify_ms']:>9} ms/verify "
+                    f"{result['logins_per_sec']:>9} logins/sec ({result['threads']} threads)"
+                    + (' [preferred]' if result['preferred'] else '')
+                )
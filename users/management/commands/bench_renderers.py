@@ -0,0 +1,76 @@
+import io
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from users.utils import renderers
+from users.utils.renderers import EnvelopeJSONParser, EnvelopeJSONRenderer
+
+
+def member_payload(count):
+    # Same shape as a UserProfileSerializer listing wrapped by custom_response
+    return {
+        'message': 'All members fetched successfully',
+        'status': 200,
+        'data': [
+            {
+                'id': i,
+                'email': f'member{i}@example.com',
+                'username': f'member{i}',
+                'role': 'member',
+                'phone': f'+92300{i:07d}',
+                'full_name': f'Member Number {i}',
+                'rank': {'id': i % 12, 'name': f'Rank {i % 12}'},
+                'is_approved': i % 3 != 0,
+            }
+            for i in range(count)
+        ],
+    }
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+class Command(BaseCommand):
+    help = "Compare DRF's JSON renderer and parser with the envelope renderer and parser"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--json', action='store_true', help='Print machine-readable results')
+
+    def handle(self, *args, **options):
+        payload = member_payload(options['members'])
+        body = JSONRenderer().render(payload)
+        repeat = options['repeat']
+
+        results = {
+            'members': options['members'],
+            'payload_bytes': len(body),
+            'orjson': renderers.orjson is not None,
+            'drf_render_ms': best_of(repeat, lambda: JSONRenderer().render(payload)),
+            'envelope_render_ms': best_of(repeat, lambda: EnvelopeJSONRenderer().render(payload)),
+            'drf_parse_ms': best_of(repeat, lambda: JSONParser().parse(io.BytesIO(body))),
+            'envelope_parse_ms': best_of(repeat, lambda: EnvelopeJSONParser().parse(io.BytesIO(body))),
+        }
+        results = {key: round(value, 2) if isinstance(value, float) else value for key, value in results.items()}
+        results['render_speedup'] = round(results['drf_render_ms'] / results['envelope_render_ms'], 1)
+        results['parse_speedup'] = round(results['drf_parse_ms'] / results['envelope_parse_ms'], 1)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{results['members']} members, {results['payload_bytes']} bytes, orjson={results['orjson']}")
+        self.stdout.write(f"render: DRF {results['drf_render_ms']} ms, envelope {results['envelope_render_ms']} ms "
+                          f"({results['render_speedup']}x)")
+        self.stdout.write(f"parse:  DRF {results['drf_parse_ms']} ms, envelope {results['envelope_parse_ms']} ms "
+                          f"({results['parse_speedup']}x)")
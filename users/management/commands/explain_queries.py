@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+
+from users.models import UserProfile
+from users.utils.pagination import MemberCursorPagination
+
+
+def endpoint_querysets(page_size=MemberCursorPagination.page_size):
+    # The queries behind each endpoint, shaped the way the views issue them.
+    return {
+        'all_members': UserProfile.objects.order_by('id')[:page_size + 1],
+        'all_members (next page)': UserProfile.objects.filter(id__gt=1000).order_by('id')[:page_size + 1],
+        'approved_members': UserProfile.objects.filter(is_approved=True).order_by('id')[:page_size + 1],
+        'new_members': UserProfile.objects.filter(is_approved=False).order_by('id')[:page_size + 1],
+        'all_members (filtered)': UserProfile.objects.filter(role=UserProfile.STAFF, rank_id=1).order_by('id')[:page_size + 1],
+        'all_members (search)': UserProfile.objects.filter(
+            Q(full_name__icontains='smith') | Q(email__icontains='smith')
+            | Q(username__icontains='smith') | Q(phone__icontains='smith')
+        ).order_by('id')[:page_size + 1],
+        'all_members (by username)': UserProfile.objects.order_by('-username')[:page_size + 1],
+        'export_members': UserProfile.objects.order_by('id'),
+        'approve_member (lookup)': UserProfile.objects.filter(id__in=[1, 2, 3]).values_list('id', 'is_approved'),
+        'approve_member (update)': UserProfile.objects.filter(id__in=[1, 2, 3], is_approved=False),
+        'approve_members (pending filter)': UserProfile.objects.filter(is_approved=False, role=UserProfile.MEMBER),
+        'login': UserProfile.objects.filter(username='member'),
+        'token version': UserProfile.objects.filter(pk=1, is_active=True).values_list('token_version', flat=True),
+        'staff and admins': UserProfile.objects.filter(role__in=[UserProfile.ADMIN, UserProfile.STAFF]),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Print the EXPLAIN plan of the queries behind each users endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('endpoints', nargs='*', help='Only explain these endpoints')
+        parser.add_argument('--analyze', action='store_true', help='Run EXPLAIN ANALYZE (PostgreSQL only)')
+
+    def handle(self, *args, **options):
+        explain_options = {'analyze': True} if options['analyze'] and connection.vendor == 'postgresql' else {}
+        for name, queryset in endpoint_querysets().items():
+            if options['endpoints'] and name.split(' ')[0] not in options['endpoints']:
+                continue
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(queryset.explain(**explain_options))
+            self.stdout.write('')
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from MMS.openapi import prune_schemas, schema_key, schema_path, uses_schema_files, write_schema, SCHEMA_FORMATS
+
+
+class Command(BaseCommand):
+    help = ('Warm the OpenAPI schema cache served at /schema/ for this release and URLconf; '
+            'run at build or deploy time')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate even if this key is already cached')
+        parser.add_argument('--prune', action='store_true',
+                            help='Delete schemas cached for other keys; run once older workers are gone')
+
+    def handle(self, *args, **options):
+        if not uses_schema_files():
+            raise CommandError('Schema files are only read with APP_VERSION set; '
+                               'set it to the release being deployed')
+        key = schema_key()
+        if options['force'] or not all(schema_path(key, schema_format).exists() for schema_format in SCHEMA_FORMATS):
+            key, schemas = write_schema(key)
+            for schema_format, (content, compressed) in schemas.items():
+                self.stdout.write(f'{schema_format}: {len(content)} bytes, {len(compressed)} gzipped')
+            self.stdout.write(self.style.SUCCESS(f'Wrote OpenAPI schema {key} to {schema_path(key, "json").parent}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'OpenAPI schema {key} is already cached'))
+
+        if options['prune']:
+            self.stdout.write(f'Removed {len(prune_schemas(key))} stale schema files')
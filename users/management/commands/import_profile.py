@@ -0,0 +1,69 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What a worker imports before it can serve: settings, apps and the URLconf
+BOOT_SCRIPT = 'import django; django.setup(); from django.urls import get_resolver; get_resolver().url_patterns'
+
+
+def parse_importtime(output):
+    """[(module, depth, self_us, cumulative_us)] from `python -X importtime` stderr, in import order"""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return modules
+
+
+class Command(BaseCommand):
+    help = 'Profile what a worker process imports at start-up, per module, with python -X importtime'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=30, help='Modules to list')
+        parser.add_argument('--sort', choices=['cumulative', 'self'], default='cumulative')
+        parser.add_argument('--prefix', help='Only list modules under this package, e.g. users')
+        parser.add_argument('--json', action='store_true', help='Print machine-readable results')
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'MMS.settings')}
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT],
+                                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError(f'Start-up failed: {result.stderr[-2000:]}')
+
+        modules = parse_importtime(result.stderr)
+        packages = defaultdict(int)
+        for name, _, self_us, _ in modules:
+            packages[name.split('.')[0]] += self_us
+        total_us = sum(self_us for _, _, self_us, _ in modules)
+
+        listed = [module for module in modules if not options['prefix'] or
+                  module[0] == options['prefix'] or module[0].startswith(options['prefix'] + '.')]
+        key = 3 if options['sort'] == 'cumulative' else 2
+        listed = sorted(listed, key=lambda module: module[key], reverse=True)[:options['limit']]
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'total_ms': round(total_us / 1000, 1),
+                'modules': len(modules),
+                'packages': {name: round(us / 1000, 1) for name, us in sorted(packages.items(), key=lambda item: -item[1])},
+                'top': [{'module': name, 'self_ms': round(self_us / 1000, 1), 'cumulative_ms': round(cumulative_us / 1000, 1)}
+                        for name, _, self_us, cumulative_us in listed],
+            }, indent=2))
+            return
+
+        self.stdout.write(f"{'cumulative':>11}{'self':>9}  module")
+        for name, _, self_us, cumulative_us in listed:
+            self.stdout.write(f'{cumulative_us / 1000:>9.1f}ms{self_us / 1000:>7.1f}ms  {name}')
+        self.stdout.write(f"\n{'self':>11}  package")
+        for name, us in sorted(packages.items(), key=lambda item: -item[1])[:15]:
+            self.stdout.write(f'{us / 1000:>9.1f}ms  {name}')
+        self.stdout.write(f'\n{len(modules)} modules imported in {total_us / 1000:.1f}ms')
@@ -0,0 +1,33 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.utils.user_import import import_users, parse_upload, ImportFormatError, IMPORT_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Bulk import users from a CSV or JSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file with a header row, or a JSON list of users')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument('--workers', type=int, default=None, help='Password hashing processes (defaults to CPU count)')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only, do not insert')
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f'{path} does not exist')
+        try:
+            rows = parse_upload(path.read_bytes(), path.name)
+        except ImportFormatError as e:
+            raise CommandError(str(e))
+
+        report = import_users(rows, batch_size=options['batch_size'], workers=options['workers'], dry_run=options['dry_run'])
+        for error in report['errors']:
+            self.stderr.write(f"row {error['row']}: {json.dumps(error['errors'])}")
+        if options['dry_run']:
+            self.stdout.write(f"{report['valid']} of {len(rows)} rows are valid")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Imported {report['created']} of {len(rows)} users"))
@@ -0,0 +1,299 @@
+import http.client
+import itertools
+import json
+import math
+import os
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+SCENARIOS = [
+    'register', 'login', 'profile', 'update_profile', 'approve_member',
+    'all_members', 'approved_members', 'new_members',
+]
+QUERIES = re.compile(r'queries=(\d+)')
+
+
+class Client:
+    """One keep-alive HTTP connection, as used by a single load generator thread"""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host, self.port, self.prefix = parts.hostname, parts.port or 80, parts.path.rstrip('/')
+        self.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+
+    def request(self, method, path, body=None, token=None):
+        headers = {'Accept': 'application/json'}
+        if body is not None:
+            body = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+
+        started = time.perf_counter()
+        try:
+            self.connection.request(method, self.prefix + path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            content = response.read()
+        except (http.client.HTTPException, OSError):
+            self.connection.close()
+            raise
+        elapsed = time.perf_counter() - started
+
+        queries = QUERIES.search(response.getheader('Server-Timing') or '')
+        return response.status, content, int(queries.group(1)) if queries else None, elapsed
+
+    def json(self, method, path, body=None, token=None):
+        status, content, _, _ = self.request(method, path, body, token)
+        if status >= 400:
+            raise CommandError(f'{method} {path} returned {status}: {content[:200]!r}')
+        return json.loads(content)['data']
+
+
+class Fixtures:
+    """Tokens and ids the scenarios need, fetched before anything is timed"""
+
+    def __init__(self, client, options):
+        self.password = options['password']
+        self.run_id = uuid.uuid4().hex[:8]
+        self.staff_token = self.login(client, options['staff_user'])
+        self.rank_ids = [rank['id'] for rank in client.json('GET', '/ranks/')] or [None]
+
+        members = client.json('GET', f"/users/approved_members/?role=member&page_size={options['concurrency']}",
+                              token=self.staff_token)['results']
+        if not members:
+            raise CommandError('No approved members to log in as; run seed_members first')
+        self.usernames = [member['username'] for member in members]
+        self.member_tokens = [self.login(client, username) for username in self.usernames]
+
+        self.pending_ids, url = [], '/users/new_members/?role=member&page_size=500'
+        while url and len(self.pending_ids) < options['max_approvals']:
+            page = client.json('GET', url, token=self.staff_token)
+            self.pending_ids += [member['id'] for member in page['results']]
+            url = page['next'] and page['next'][page['next'].index('/users/'):]
+        self._approvals = itertools.cycle(self.pending_ids or [0])
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def login(self, client, username):
+        return client.json('POST', '/users/login/', {'username': username, 'password': self.password})['tokens']['access']
+
+    def next_number(self):
+        with self._lock:
+            return next(self._counter)
+
+    def next_approval(self):
+        with self._lock:
+            return next(self._approvals)
+
+    def build(self, scenario, worker):
+        """(method, path, body, token) for the next request of a scenario"""
+        member = worker % len(self.usernames)
+        if scenario == 'register':
+            n = self.next_number()
+            return 'POST', '/users/register/', {
+                'email': f'load-{self.run_id}-{n}@example.com', 'username': f'load-{self.run_id}-{n}',
+                'password': self.password, 'rank_id': self.rank_ids[n % len(self.rank_ids)],
+            }, None
+        if scenario == 'login':
+            return 'POST', '/users/login/', {'username': self.usernames[member], 'password': self.password}, None
+        if scenario == 'profile':
+            return 'GET', '/users/profile/', None, self.member_tokens[member]
+        if scenario == 'update_profile':
+            return 'PUT', '/users/update_profile/', {'full_name': f'Load Test {self.next_number()}'}, self.member_tokens[member]
+        if scenario == 'approve_member':
+            return 'POST', '/users/approve_member/', {'user_id': self.next_approval()}, self.staff_token
+        return 'GET', f'/users/{scenario}/', None, self.staff_token
+
+
+def percentile(sorted_values, percent):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return None
+    return sorted_values[max(math.ceil(percent / 100 * len(sorted_values)) - 1, 0)]
+
+
+def run_scenario(base_url, fixtures, scenario, options):
+    deadline = None
+    remaining = itertools.count()
+    samples, errors = [], []
+    lock = threading.Lock()
+
+    def worker(index):
+        client = Client(base_url)
+        local = []
+        for _ in range(options['warmup']):
+            client.request(*fixtures.build(scenario, index))
+        while True:
+            if options['requests']:
+                with lock:
+                    if next(remaining) >= options['requests']:
+                        break
+            elif time.perf_counter() >= deadline:
+                break
+            try:
+                status, _, queries, elapsed = client.request(*fixtures.build(scenario, index))
+            except (http.client.HTTPException, OSError) as e:
+                with lock:
+                    errors.append(repr(e))
+                client = Client(base_url)
+                continue
+            local.append((status, queries, elapsed))
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(options['concurrency'])]
+    started = time.perf_counter()
+    deadline = started + options['duration']
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(sample[2] * 1000 for sample in samples)
+    queries = [sample[1] for sample in samples if sample[1] is not None]
+    statuses = {}
+    for status, _, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        'requests': len(samples),
+        'errors': len(errors) + sum(count for status, count in statuses.items() if not status.startswith('2')),
+        'statuses': statuses,
+        'throughput_rps': round(len(samples) / elapsed, 2),
+        'mean_ms': round(sum(latencies) / len(latencies), 2) if latencies else None,
+        'p50_ms': round(percentile(latencies, 50), 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95), 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99), 2) if latencies else None,
+        'max_ms': round(latencies[-1], 2) if latencies else None,
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+
+def compare(results, baseline, max_regression):
+    """Per-scenario change against a baseline run, in percent; flags p95 and throughput regressions"""
+    comparison, regressions = {}, []
+    for scenario, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(scenario)
+        if not previous or not previous.get('p95_ms') or not current.get('p95_ms'):
+            continue
+        p95 = round((current['p95_ms'] / previous['p95_ms'] - 1) * 100, 1)
+        throughput = round((current['throughput_rps'] / previous['throughput_rps'] - 1) * 100, 1)
+        comparison[scenario] = {'p95_change_pct': p95, 'throughput_change_pct': throughput}
+        if max_regression is not None and (p95 > max_regression or -throughput > max_regression):
+            regressions.append(scenario)
+    return comparison, regressions
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(command, port):
+    # Every load generator shares one address and a handful of accounts, so throttling would
+    # turn the login and register scenarios into a measurement of 429s.
+    env = {**os.environ, 'PERF_METRICS_SAMPLE_RATE': '1', 'THROTTLING': 'false'}
+    server = subprocess.Popen(command.format(port=port).split(), cwd=settings.BASE_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise CommandError(f'Server exited: {server.stderr.read().decode()[-2000:]}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise CommandError('Server did not start within 30s')
+
+
+class Command(BaseCommand):
+    help = 'Drive the users API with concurrent clients and report latency percentiles, throughput and queries per request'
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenarios', nargs='*', help=f"Any of {', '.join(SCENARIOS)}; defaults to all")
+        parser.add_argument('--url', help='Target an already running server instead of starting one')
+        parser.add_argument('--server-command', default=f'{sys.executable} manage.py runserver 127.0.0.1:{{port}} --noreload',
+                            help='Command that starts the server; {port} is filled in')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=10, help='Seconds per scenario')
+        parser.add_argument('--requests', type=int, default=0, help='Requests per scenario instead of --duration')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed requests per client before each scenario')
+        parser.add_argument('--staff-user', default='bench0', help='Staff account used for the staff-only endpoints')
+        parser.add_argument('--password', default='bench-password', help='Password shared by the seeded users')
+        parser.add_argument('--max-approvals', type=int, default=5000, help='Pending members fetched for approve_member')
+        parser.add_argument('--output', help='Write the JSON results to this file')
+        parser.add_argument('--baseline', help='Compare against the JSON results of an earlier run')
+        parser.add_argument('--max-regression', type=float, help='Fail if p95 or throughput regress by more than this percent')
+        parser.add_argument('--json', action='store_true', help='Print machine-readable results')
+
+    def handle(self, *args, **options):
+        unknown = set(options['scenarios']) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+        server, base_url = None, options['url']
+        if not base_url:
+            port = free_port()
+            server = start_server(options['server_command'], port)
+            base_url = f'http://127.0.0.1:{port}'
+
+        try:
+            fixtures = Fixtures(Client(base_url), options)
+            results = {
+                'meta': {
+                    'url': base_url,
+                    'server': None if options['url'] else options['server_command'],
+                    'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                    'concurrency': options['concurrency'],
+                    'duration': None if options['requests'] else options['duration'],
+                    'requests': options['requests'] or None,
+                },
+                'scenarios': {},
+            }
+            for scenario in options['scenarios'] or SCENARIOS:
+                if not options['json']:
+                    self.stderr.write(f'{scenario}...')
+                results['scenarios'][scenario] = run_scenario(base_url, fixtures, scenario, options)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+        regressions = []
+        if baseline is not None:
+            results['comparison'], regressions = compare(results, baseline, options['max_regression'])
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            self.stdout.write(f"{'scenario':<18}{'req':>7}{'err':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}")
+            for scenario, result in results['scenarios'].items():
+                self.stdout.write(
+                    f"{scenario:<18}{result['requests']:>7}{result['errors']:>6}{result['throughput_rps']:>9}"
+                    f"{result['p50_ms']!s:>9}{result['p95_ms']!s:>9}{result['p99_ms']!s:>9}{result['queries_per_request']!s:>9}"
+                )
+            for scenario, change in results.get('comparison', {}).items():
+                self.stdout.write(f"{scenario:<18}p95 {change['p95_change_pct']:+}%  throughput {change['throughput_change_pct']:+}%")
+
+        if regressions:
+            raise CommandError(f"Regressed more than {options['max_regression']}%: {', '.join(regressions)}")
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from users.utils.member_stats import find_drift, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Check the membership statistics table for drift, or rebuild it from the members table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Recount every bucket from scratch')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            counts = rebuild()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(counts)} statistics buckets'))
+            return
+
+        drift = find_drift()
+        for (dimension, key), (stored, actual) in drift.items():
+            self.stderr.write(f'{dimension}:{key} stored {stored}, actual {actual}')
+        if drift:
+            raise CommandError(f'{len(drift)} buckets have drifted; run with --rebuild to fix them')
+        self.stdout.write(self.style.SUCCESS('Membership statistics are up to date'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from users.models.revoked_token_model import RevokedToken
+
+PURGE_BATCH_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = 'Delete revoked refresh tokens that have expired; schedule it daily'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=PURGE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        # Small batches keep each DELETE short, so refreshes are never stuck behind a long lock.
+        expired = RevokedToken.objects.filter(expires_at__lte=timezone.now())
+        purged = 0
+        while True:
+            batch = list(expired.values_list('pk', flat=True)[:options['batch_size']])
+            if not batch:
+                break
+            purged += RevokedToken.objects.filter(pk__in=batch).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} expired revoked tokens'))
@@ -0,0 +1,48 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from users.models.task_model import Task
+from users.utils.task_queue import purge_finished, run_pending, worker_name
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks; start one process per worker you want'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10, help='Tasks claimed per poll')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--burst', action='store_true', help='Exit once no task is due')
+        parser.add_argument('--purge', action='store_true', help='Delete finished tasks older than TASK_RESULT_TTL and exit')
+
+    def handle(self, *args, **options):
+        if options['purge']:
+            purged = purge_finished(settings.TASK_RESULT_TTL)
+            self.stdout.write(self.style.SUCCESS(f'Purged {purged} finished tasks'))
+            return
+
+        stopping = []
+        # Finish the current batch on SIGTERM/SIGINT instead of abandoning leased tasks.
+        for signum in [signal.SIGTERM, signal.SIGINT]:
+            signal.signal(signum, lambda *_: stopping.append(True))
+
+        worker = worker_name()
+        # None counts tasks whose lease ran out mid-run and another worker reclaimed
+        counts = {Task.DONE: 0, Task.PENDING: 0, Task.FAILED: 0, None: 0}
+        while not stopping:
+            outcomes = run_pending(worker, options['batch_size'])
+            for outcome in outcomes:
+                counts[outcome] += 1
+            close_old_connections()
+            if not outcomes:
+                if options['burst']:
+                    break
+                time.sleep(options['poll_interval'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{worker}: {counts[Task.DONE]} done, {counts[Task.PENDING]} retrying, {counts[Task.FAILED]} failed, "
+            f"{counts[None]} lost to another worker"
+        ))
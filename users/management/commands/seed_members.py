@@ -0,0 +1,62 @@
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from users.models import UserProfile
+from users.models.user_rank_model import UserRank
+from users.utils import member_stats
+from users.utils.response_cache import bump_versions, MEMBERS_NAMESPACE
+
+SEED_BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = 'Seed ranks and members for benchmarks, with one shared password hash and bulk inserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=10000)
+        parser.add_argument('--ranks', type=int, default=12)
+        parser.add_argument('--staff', type=int, default=5, help='Staff accounts among the members')
+        parser.add_argument('--approved-ratio', type=float, default=0.7)
+        parser.add_argument('--prefix', default='bench', help='Username and email prefix for seeded users')
+        parser.add_argument('--password', default='bench-password', help='Password of every seeded user')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for reproducible datasets')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rng = random.Random(options['seed'])
+        prefix = options['prefix']
+
+        UserRank.objects.bulk_create([UserRank(name=f'{prefix.title()} Rank {i}') for i in range(options['ranks'])],
+                                     ignore_conflicts=True)
+        rank_ids = list(UserRank.objects.filter(name__startswith=f'{prefix.title()} Rank ').values_list('id', flat=True))
+        # Hashing is deliberately slow, so every seeded user shares one hash.
+        password = make_password(options['password'])
+        start = UserProfile.objects.filter(username__startswith=prefix).count()
+
+        with transaction.atomic():
+            for offset in range(0, options['members'], SEED_BATCH_SIZE):
+                UserProfile.objects.bulk_create([
+                    UserProfile(
+                        email=f'{prefix}{i}@example.com',
+                        username=f'{prefix}{i}',
+                        password=password,
+                        full_name=f'{prefix.title()} Member {i}',
+                        phone=f'+1555{i:07d}',
+                        rank_id=rng.choice(rank_ids) if rank_ids else None,
+                        role=UserProfile.STAFF if i - start < options['staff'] else UserProfile.MEMBER,
+                        is_approved=i - start < options['staff'] or rng.random() < options['approved_ratio'],
+                    )
+                    for i in range(start + offset, start + min(offset + SEED_BATCH_SIZE, options['members']))
+                ])
+            # bulk_create bypasses the signals that keep the summary table current
+            member_stats.rebuild()
+        bump_versions(MEMBERS_NAMESPACE)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {options['members']} members ({prefix}{start}..{prefix}{start + options['members'] - 1}, "
+            f"first {options['staff']} are staff) across {len(rank_ids)} ranks in {time.perf_counter() - started:.1f}s"
+        ))
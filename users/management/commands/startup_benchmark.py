@@ -0,0 +1,88 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter: boot the WSGI application and serve one request in-process.
+FIRST_REQUEST_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+booted = time.perf_counter()
+environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': sys.argv[1], 'QUERY_STRING': '', 'SERVER_NAME': '127.0.0.1',
+           'SERVER_PORT': '80', 'HTTP_HOST': '127.0.0.1', 'wsgi.url_scheme': 'http', 'wsgi.input': sys.stdin.buffer,
+           'wsgi.errors': sys.stderr}
+statuses = []
+b''.join(application(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+served = time.perf_counter()
+print(json.dumps({'status': int(statuses[0].split()[0]), 'boot_ms': (booted - started) * 1000,
+                  'first_request_ms': (served - booted) * 1000}))
+'''
+PHASES = ['wall_ms', 'boot_ms', 'first_request_ms']
+
+
+class Command(BaseCommand):
+    help = 'Measure time to first request: a new process booting the app and serving one request'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/ranks/', help='Unauthenticated GET path to request')
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--output', help='Write the JSON results to this file')
+        parser.add_argument('--baseline', help='Compare against the JSON results of an earlier run')
+        parser.add_argument('--max-regression', type=float, help='Fail if the median wall time regresses by more than this percent')
+        parser.add_argument('--json', action='store_true', help='Print machine-readable results')
+
+    def run_once(self, path):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'MMS.settings')}
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', FIRST_REQUEST_SCRIPT, path], cwd=settings.BASE_DIR,
+                                env=env, capture_output=True, text=True)
+        wall_ms = (time.perf_counter() - started) * 1000
+        if result.returncode:
+            raise CommandError(f'Start-up failed: {result.stderr[-2000:]}')
+        sample = json.loads(result.stdout.strip().splitlines()[-1])
+        if sample['status'] >= 400:
+            raise CommandError(f"GET {path} returned {sample['status']}")
+        return {**sample, 'wall_ms': wall_ms}
+
+    def handle(self, *args, **options):
+        samples = [self.run_once(options['path']) for _ in range(options['runs'])]
+        results = {
+            'path': options['path'],
+            'runs': options['runs'],
+            **{
+                phase: {
+                    'median': round(statistics.median(sample[phase] for sample in samples), 1),
+                    'min': round(min(sample[phase] for sample in samples), 1),
+                    'max': round(max(sample[phase] for sample in samples), 1),
+                }
+                for phase in PHASES
+            },
+        }
+
+        regression = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                previous = json.load(f)['wall_ms']['median']
+            results['wall_change_pct'] = regression = round((results['wall_ms']['median'] / previous - 1) * 100, 1)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            self.stdout.write(f"{'phase':<18}{'median':>9}{'min':>9}{'max':>9}")
+            for phase in PHASES:
+                self.stdout.write(f"{phase:<18}{results[phase]['median']:>9}{results[phase]['min']:>9}{results[phase]['max']:>9}")
+            if regression is not None:
+                self.stdout.write(f'wall time {regression:+}% against the baseline')
+
+        if regression is not None and options['max_regression'] is not None and regression > options['max_regression']:
+            raise CommandError(f"Time to first request regressed {regression}% (limit {options['max_regression']}%)")
@@ -1,4 +1,19 @@
+from asgiref.sync import sync_to_async
 from django.contrib.auth.base_user import BaseUserManager
+from django.db import transaction
+from django.db.models import F
+from django.dispatch import Signal
+
+APPROVED = 'approved'
+ALREADY_APPROVED = 'already_approved'
+NOT_FOUND = 'not_found'
+
+# Sent after approve_members flips rows with a queryset UPDATE, which bypasses post_save;
+# user_ids are exactly the rows that UPDATE approved.
+members_approved = Signal()
+# Sent after change_role; previous maps each old role to how many of user_ids had it.
+members_role_changed = Signal()
+
 
 class UserProfileManager(BaseUserManager):
     """Manager for user profiles"""
@@ -15,9 +30,85 @@ class UserProfileManager(BaseUserManager):
 
         return user
 
+    async def acreate_user(self, email, username, password=None, **extra_fields):
+        """create_user() for async views, hashing on the shared hashing pool"""
+        # users.utils imports DRF, which needs the models loaded first
+        from users.utils.hashing import amake_password
+
+        if not email:
+            raise ValueError('Users must have an email')
+
+        email = self.normalize_email(email)
+        user = self.model(email=email, username=username, **extra_fields)
+
+        user.password = await amake_password(password)
+        await user.asave(using=self._db)
+
+        return user
+
     def create_superuser(self, email, username, password):
         user = self.create_user(email, username, password)
 
         user.is_superuser = True
         user.is_staff = True
-        user.save(using=self._db)
\ No newline at end of file
+        user.save(using=self._db)
+
+        return user
+
+    def approve_members(self, user_ids=None, **filters):
+        """
+        Approve the given ids (or every pending member matching filters) with one locking
+        lookup and one UPDATE, returning an {id: outcome} mapping.
+        """
+        user_ids, states, approved = self._approve(user_ids, filters)
+        if approved:
+            members_approved.send(sender=self.model, user_ids=approved)
+        return self._approval_outcomes(user_ids, states)
+
+    async def aapprove_members(self, user_ids=None, **filters):
+        # transaction.atomic() has no async form
+        user_ids, states, approved = await sync_to_async(self._approve)(user_ids, filters)
+        if approved:
+            await members_approved.asend(sender=self.model, user_ids=approved)
+        return self._approval_outcomes(user_ids, states)
+
+    def change_role(self, role, **filters):
+        """
+        Move every member matching filters to role with one lookup and one UPDATE,
+        revoking their tokens; returns the ids that changed.
+        """
+        changed = dict(self.filter(**filters).exclude(role=role).values_list('id', 'role'))
+        if changed:
+            self.filter(id__in=changed).update(role=role, token_version=F('token_version') + 1)
+            previous = {}
+            for old_role in changed.values():
+                previous[old_role] = previous.get(old_role, 0) + 1
+            members_role_changed.send(sender=self.model, user_ids=list(changed), role=role, previous=previous)
+        return list(changed)
+
+    def _approval_lookup(self, user_ids, filters):
+        lookup = self.filter(**filters)
+        if user_ids is not None:
+            user_ids = list(dict.fromkeys(user_ids))
+            return user_ids, lookup.filter(id__in=user_ids)
+        return None, lookup.filter(is_approved=False)
+
+    def _approve(self, user_ids, filters):
+        user_ids, lookup = self._approval_lookup(user_ids, filters)
+        with transaction.atomic():
+            # A concurrent approval of the same rows waits on the lock and then reads them as
+            # approved, so each id is reported and signalled by the one request that flipped it.
+            states = dict(lookup.select_for_update().values_list('id', 'is_approved'))
+            pending = [user_id for user_id, is_approved in states.items() if not is_approved]
+            if pending:
+                self.filter(id__in=pending).update(is_approved=True)
+        return user_ids, states, pending
+
+    @staticmethod
+    def _approval_outcomes(user_ids, states):
+        if user_ids is None:
+            user_ids = list(states)
+        return {
+            user_id: NOT_FOUND if user_id not in states else ALREADY_APPROVED if states[user_id] else APPROVED
+            for user_id in user_ids
+        }
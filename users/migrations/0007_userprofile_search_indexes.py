@@ -0,0 +1,34 @@
+from django.db import migrations
+
+# icontains compiles to UPPER("col"::text) LIKE UPPER(%s) on PostgreSQL, so the trigram
+# indexes are built over that expression. Other backends keep the plain scan.
+SEARCH_COLUMNS = ['full_name', 'email', 'username', 'phone']
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for column in SEARCH_COLUMNS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS users_profile_{column}_trgm ON users_userprofile '
+            f'USING gin (UPPER({column}::text) gin_trgm_ops)'
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for column in SEARCH_COLUMNS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS users_profile_{column}_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_userprofile_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.4 on 2026-10-18 18:06
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_existing_members(apps, schema_editor):
+    UserProfile = apps.get_model('users', 'UserProfile')
+    UserRank = apps.get_model('users', 'UserRank')
+    MemberStat = apps.get_model('users', 'MemberStat')
+    # Seed every bucket, so the signal handlers' single UPDATE always finds its rows
+    counts = Counter({('role', role): 0 for role in ['admin', 'staff', 'member']})
+    counts.update({('rank', str(rank_id)): 0 for rank_id in UserRank.objects.values_list('id', flat=True)})
+    counts.update({('rank', 'none'): 0, ('approval', 'approved'): 0, ('approval', 'pending'): 0})
+    grouped = UserProfile.objects.order_by().values_list('role', 'rank_id', 'is_approved').annotate(total=Count('id'))
+    for role, rank_id, is_approved, total in grouped:
+        counts['role', role] += total
+        counts['rank', 'none' if rank_id is None else str(rank_id)] += total
+        counts['approval', 'approved' if is_approved else 'pending'] += total
+    MemberStat.objects.bulk_create([MemberStat(dimension=dimension, key=key, count=count)
+                                    for (dimension, key), count in counts.items()])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_userprofile_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemberStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('role', 'Role'), ('rank', 'Rank'), ('approval', 'Approval')], max_length=20, verbose_name='Dimension')),
+                ('key', models.CharField(max_length=50, verbose_name='Key')),
+                ('count', models.IntegerField(default=0, verbose_name='Count')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'key'), name='users_memberstat_bucket_unique')],
+            },
+        ),
+        migrations.RunPython(count_existing_members, migrations.RunPython.noop),
+    ]
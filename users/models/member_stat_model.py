@@ -0,0 +1,27 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class MemberStat(models.Model):
+    """Running member count for one bucket, e.g. ('role', 'staff') or ('rank', '3')"""
+    ROLE = 'role'
+    RANK = 'rank'
+    APPROVAL = 'approval'
+
+    DIMENSION_CHOICES = [
+        (ROLE, 'Role'),
+        (RANK, 'Rank'),
+        (APPROVAL, 'Approval'),
+    ]
+
+    dimension = models.CharField(_('Dimension'), max_length=20, choices=DIMENSION_CHOICES)
+    key = models.CharField(_('Key'), max_length=50)
+    count = models.IntegerField(_('Count'), default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'key'], name='users_memberstat_bucket_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.dimension}:{self.key} = {self.count}'
@@ -0,0 +1,14 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from users.models.user_profile_model import UserProfile
+
+
+class RevokedToken(models.Model):
+    """A refresh token that has been used up by rotation; kept until it would have expired anyway"""
+    jti = models.CharField(_('Token ID'), max_length=255, unique=True)
+    user = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='revoked_tokens')
+    expires_at = models.DateTimeField(_('Expires At'), db_index=True)
+
+    def __str__(self):
+        return self.jti
@@ -0,0 +1,41 @@
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+class Task(models.Model):
+    """A unit of follow-up work queued by a request and run by the run_tasks worker"""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(_('Task Name'), max_length=100)
+    payload = models.JSONField(_('Payload'), default=dict)
+    # Enqueueing the same key twice is a no-op, so retried requests never duplicate work.
+    idempotency_key = models.CharField(_('Idempotency Key'), max_length=255, unique=True, null=True, blank=True)
+    status = models.CharField(_('Status'), max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(_('Attempts'), default=0)
+    max_attempts = models.PositiveIntegerField(_('Max Attempts'), default=5)
+    run_at = models.DateTimeField(_('Run At'), default=timezone.now)
+    locked_by = models.CharField(_('Locked By'), max_length=100, blank=True)
+    locked_at = models.DateTimeField(_('Locked At'), null=True, blank=True)
+    last_error = models.TextField(_('Last Error'), blank=True)
+    created_at = models.DateTimeField(_('Created At'), auto_now_add=True)
+    finished_at = models.DateTimeField(_('Finished At'), null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers poll for due work: WHERE status = 'pending' AND run_at <= now ORDER BY run_at
+            models.Index(fields=['status', 'run_at'], name='users_task_due_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
@@ -26,11 +26,21 @@ class UserProfile(AbstractBaseUser, PermissionsMixin):
     is_active = models.BooleanField(_('Is Active'), default=True)
     is_staff = models.BooleanField(_('Is Staff'), default=False)
     is_approved = models.BooleanField(_('Is Approved'), default=False)
+    token_version = models.PositiveIntegerField(_('Token Version'), default=0)
 
     objects = UserProfileManager()
 
     USERNAME_FIELD = 'username'
     REQUIRED_FIELDS = ['email']
 
+    class Meta:
+        indexes = [
+            # approved_members: WHERE is_approved = true ORDER BY id, walked by the cursor paginator
+            models.Index(fields=['is_approved', 'id'], name='users_profile_approved_idx'),
+            # pending approvals are a small slice of the table, so index only those rows
+            models.Index(fields=['id'], condition=models.Q(is_approved=False), name='users_profile_pending_idx'),
+            models.Index(fields=['role'], name='users_profile_role_idx'),
+        ]
+
     def __str__(self):
         return self.email
\ No newline at end of file
@@ -1,4 +1,22 @@
 from rest_framework import serializers
 
+from users.models import UserProfile
+
+
 class ApproveMemberSerializer(serializers.Serializer):
-    user_id = serializers.IntegerField(required=True)
\ No newline at end of file
+    user_id = serializers.IntegerField(required=True)
+
+
+class BulkApproveMemberSerializer(serializers.Serializer):
+    user_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False, max_length=1000)
+    rank_id = serializers.IntegerField(required=False)
+    role = serializers.ChoiceField(choices=UserProfile.ROLE_CHOICES, required=False)
+    all_pending = serializers.BooleanField(required=False, default=False)
+
+    def validate(self, attrs):
+        if 'user_ids' not in attrs and not ({'rank_id', 'role'} & attrs.keys()) and not attrs['all_pending']:
+            raise serializers.ValidationError('Provide user_ids, a rank_id/role filter or all_pending')
+        return attrs
+
+    def get_filters(self):
+        return {key: self.validated_data[key] for key in ['rank_id', 'role'] if key in self.validated_data}
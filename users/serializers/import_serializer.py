@@ -0,0 +1,20 @@
+from rest_framework import serializers
+
+from users.models import UserProfile
+
+
+class UserImportRowSerializer(serializers.Serializer):
+    email = serializers.EmailField(max_length=255)
+    username = serializers.CharField(max_length=255)
+    password = serializers.CharField(write_only=True)
+    role = serializers.ChoiceField(choices=UserProfile.ROLE_CHOICES, default=UserProfile.MEMBER)
+    phone = serializers.CharField(max_length=255, required=False, allow_null=True, allow_blank=True)
+    full_name = serializers.CharField(max_length=255, required=False, allow_null=True, allow_blank=True)
+    rank_id = serializers.IntegerField(required=False, allow_null=True)
+    is_approved = serializers.BooleanField(default=False)
+
+
+class UserImportSerializer(serializers.Serializer):
+    file = serializers.FileField(required=False)
+    users = serializers.ListField(child=serializers.DictField(), required=False)
+    dry_run = serializers.BooleanField(default=False)
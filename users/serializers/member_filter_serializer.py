@@ -0,0 +1,27 @@
+from django.db.models import Q
+from rest_framework import serializers
+
+from users.models import UserProfile
+from users.utils.pagination import MemberCursorPagination
+
+SEARCH_FIELDS = ['full_name', 'email', 'username', 'phone']
+
+
+class MemberFilterSerializer(serializers.Serializer):
+    role = serializers.ChoiceField(choices=UserProfile.ROLE_CHOICES, required=False)
+    rank_id = serializers.IntegerField(required=False)
+    is_approved = serializers.BooleanField(required=False)
+    search = serializers.CharField(required=False, max_length=255,
+                                   help_text=f"Case-insensitive match on {', '.join(SEARCH_FIELDS)}")
+    ordering = serializers.ChoiceField(choices=MemberCursorPagination.ordering_choices(), required=False)
+
+    def filter_queryset(self, queryset):
+        filters = {key: self.validated_data[key] for key in ['role', 'rank_id', 'is_approved'] if key in self.validated_data}
+        queryset = queryset.filter(**filters)
+        if self.validated_data.get('search'):
+            # Backed by trigram indexes on PostgreSQL (migration 0007)
+            search = Q()
+            for field in SEARCH_FIELDS:
+                search |= Q(**{f'{field}__icontains': self.validated_data['search']})
+            queryset = queryset.filter(search)
+        return queryset
@@ -0,0 +1,32 @@
+from users.utils.rank_cache import get_ranks
+
+# Columns needed to reproduce UserProfileSerializer's read output, in output order
+MEMBER_FIELDS = ['id', 'email', 'username', 'role', 'phone', 'full_name', 'rank_id', 'is_approved']
+
+
+def member_rows(members):
+    return members.values(*MEMBER_FIELDS)
+
+
+def serialize_members(rows, ranks=None):
+    """
+    Read-only listing output built from member_rows() dicts in one pass, joined with the
+    rank cache. Produces exactly what UserProfileSerializer(many=True).data renders to,
+    without instantiating models or serializer fields per row. Async callers pass ranks in,
+    since get_ranks() may query the database on a cache miss.
+    """
+    if ranks is None:
+        ranks = get_ranks()
+    return [
+        {
+            'id': row['id'],
+            'email': row['email'],
+            'username': row['username'],
+            'role': row['role'],
+            'phone': row['phone'],
+            'full_name': row['full_name'],
+            'rank': ranks.get(row['rank_id']) if row['rank_id'] is not None else None,
+            'is_approved': row['is_approved'],
+        }
+        for row in rows
+    ]
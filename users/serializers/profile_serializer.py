@@ -1,39 +1,77 @@
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
 from users.models import UserProfile
 from users.models.user_rank_model import UserRank
-from users.serializers.rank_serializer import UserRankSerializer
+from users.serializers.rank_serializer import CachedUserRankSerializer, CachedRankField
+
+class DuplicateUserError(Exception):
+    def __init__(self, field):
+        self.field = field
+        super().__init__('Email already registered' if field == 'email' else 'Username already taken')
+
+
+SQLITE_UNIQUE_FAILED = 'UNIQUE constraint failed: '
+UNIQUE_VIOLATION = '23505'
+
+
+def duplicate_user_error(exc):
+    """
+    DuplicateUserError for an IntegrityError raised by the email or username unique constraint,
+    or None for any other integrity error, which the caller should re-raise.
+    """
+    table = UserProfile._meta.db_table
+    diag = getattr(exc.__cause__, 'diag', None)
+    if diag is not None:
+        # PostgreSQL names the constraint <table>_<column>_key (or _<hash>_uniq once altered)
+        if diag.sqlstate != UNIQUE_VIOLATION or not diag.constraint_name:
+            return None
+        matches = [field for field in ['email', 'username'] if diag.constraint_name.startswith(f'{table}_{field}_')]
+    else:
+        # SQLite: "UNIQUE constraint failed: users_userprofile.email"
+        message = str(exc)
+        if not message.startswith(SQLITE_UNIQUE_FAILED):
+            return None
+        columns = message[len(SQLITE_UNIQUE_FAILED):].split(', ')
+        matches = [field for field in ['email', 'username'] if f'{table}.{field}' in columns]
+    return DuplicateUserError(matches[0]) if matches else None
+
 
 # Serializer for creating a new UserProfile
 class UserProfileSerializer(serializers.ModelSerializer):
-    rank_id = serializers.PrimaryKeyRelatedField(
+    rank_id = CachedRankField(
         queryset=UserRank.objects.all(), source='rank', write_only=True
     )
-    rank = UserRankSerializer(read_only=True)  # Display rank details after creation
+    rank = CachedUserRankSerializer(read_only=True)  # Display rank details after creation
 
     class Meta:
         model = UserProfile
         fields = ['id', 'email', 'username', 'password', 'role', 'phone', 'full_name', 'rank', 'rank_id', 'is_approved']
+        # Uniqueness is left to the database constraints instead of a SELECT per field before the INSERT
         extra_kwargs = {
             'password': {'write_only': True},
-            'email': {'required': True},
-            'username': {'required': True},
+            'email': {'required': True, 'validators': []},
+            'username': {'required': True, 'validators': []},
         }
 
     def create(self, validated_data):
-        rank = validated_data.pop('rank', None)  # Extract rank if provided
-        user = UserProfile.objects.create_user(**validated_data)
-        if rank:
-            user.rank = rank  # Assign rank to the user
-            user.save()
+        # rank travels with the other fields, so the user is written with a single INSERT
+        try:
+            with transaction.atomic():
+                user = UserProfile.objects.create_user(**validated_data)
+        except IntegrityError as e:
+            error = duplicate_user_error(e)
+            if error is None:
+                raise
+            raise error from e
         return user
 
 
 # Serializer for updating UserProfile data
 class UserProfileUpdateSerializer(serializers.ModelSerializer):
-    rank_id = serializers.PrimaryKeyRelatedField(
+    rank_id = CachedRankField(
         queryset=UserRank.objects.all(), source='rank', write_only=True
     )
-    rank = UserRankSerializer(read_only=True)  # Display rank details after update
+    rank = CachedUserRankSerializer(read_only=True)  # Display rank details after update
 
     class Meta:
         model = UserProfile
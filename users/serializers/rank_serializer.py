@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from users.models.user_rank_model import UserRank
+from users.utils.rank_cache import get_rank
 
 
 class UserRankSerializer(serializers.ModelSerializer):
@@ -8,4 +9,27 @@ class UserRankSerializer(serializers.ModelSerializer):
         fields = ['id', 'name']
     def create(self, validated_data):
         rank = UserRank.objects.create(**validated_data)
-        return rank
\ No newline at end of file
+        return rank
+
+
+class CachedUserRankSerializer(UserRankSerializer):
+    """Nested rank output read from the rank cache via rank_id instead of the rank relation"""
+
+    def get_attribute(self, instance):
+        rank_id = instance['rank_id'] if isinstance(instance, dict) else instance.rank_id
+        return get_rank(rank_id) if rank_id is not None else None
+
+
+class CachedRankField(serializers.PrimaryKeyRelatedField):
+    """rank_id input validated against the rank cache; the queryset is only used for schema generation"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            rank = get_rank(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if rank is None:
+            self.fail('does_not_exist', pk_value=data)
+        return UserRank.from_db(None, ['id', 'name'], [rank['id'], rank['name']])
@@ -0,0 +1,34 @@
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+from users.utils.tokens import MemberRefreshToken, get_token_version, revoke_refresh_token, REVOKED_VERSION
+
+
+class MemberTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = MemberRefreshToken
+
+
+class MemberTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh without loading the user: the cached token version stands in for the active-user
+    check, and rotated tokens are recorded in the revocation store instead of simplejwt's
+    outstanding/blacklist tables.
+    """
+    token_class = MemberRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        version = get_token_version(refresh[api_settings.USER_ID_CLAIM])
+        if version == REVOKED_VERSION or refresh.get('ver', version) != version:
+            raise InvalidToken('Token has been revoked')
+
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION and not revoke_refresh_token(refresh):
+                raise InvalidToken('Token has been revoked')
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
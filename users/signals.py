@@ -0,0 +1,99 @@
+from django.db.models import F
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from users.managers.managers import members_approved, members_role_changed
+from users.models import UserProfile
+from users.models.member_stat_model import MemberStat
+from users.models.user_rank_model import UserRank
+from users.tasks import MEMBER_APPROVED
+from users.utils import member_stats, rank_cache
+from users.utils.response_cache import bump_versions, profile_namespace, MEMBERS_NAMESPACE
+from users.utils.task_queue import enqueue_many
+from users.utils.tokens import forget_token_versions
+
+# Fields baked into access tokens; changing them revokes outstanding tokens.
+TOKEN_FIELDS = ['role', 'is_active']
+# Fields the membership statistics are bucketed by.
+STAT_FIELDS = ['role', 'rank_id', 'is_approved']
+
+
+@receiver([post_save, post_delete], sender=UserRank)
+def invalidate_rank_cache(sender, **kwargs):
+    rank_cache.invalidate()
+
+
+@receiver(post_save, sender=UserRank)
+def seed_rank_stats(sender, instance, created, **kwargs):
+    if created:
+        member_stats.seed_buckets((MemberStat.RANK, str(instance.pk)))
+
+
+@receiver(post_delete, sender=UserRank)
+def move_rank_stats(sender, instance, **kwargs):
+    member_stats.forget_rank(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def invalidate_profile_cache(sender, instance, **kwargs):
+    bump_versions(profile_namespace(instance.pk), MEMBERS_NAMESPACE)
+
+
+@receiver(members_approved)
+def invalidate_approved_profiles(sender, user_ids, **kwargs):
+    bump_versions(*[profile_namespace(user_id) for user_id in user_ids], MEMBERS_NAMESPACE)
+
+
+@receiver(members_approved)
+def count_approvals(sender, user_ids, **kwargs):
+    member_stats.record_approvals(len(user_ids))
+
+
+@receiver(members_role_changed)
+def apply_role_change(sender, user_ids, role, previous, **kwargs):
+    # The UPDATE already bumped token_version; drop the cached copies.
+    forget_token_versions(*user_ids)
+    bump_versions(*[profile_namespace(user_id) for user_id in user_ids], MEMBERS_NAMESPACE)
+    member_stats.record_role_change(previous, role)
+
+
+@receiver(members_approved)
+def queue_approval_notices(sender, user_ids, **kwargs):
+    enqueue_many([(MEMBER_APPROVED, {'user_id': user_id}, f'approved:{user_id}') for user_id in user_ids])
+
+
+@receiver(post_init, sender=UserProfile)
+def remember_tracked_fields(sender, instance, **kwargs):
+    # Read through __dict__ so deferred fields are never loaded just for the snapshot.
+    instance._token_fields = [instance.__dict__.get(field) for field in TOKEN_FIELDS]
+    instance._stat_fields = [instance.__dict__.get(field) for field in STAT_FIELDS]
+
+
+@receiver(post_save, sender=UserProfile)
+def revoke_tokens_on_role_change(sender, instance, created, **kwargs):
+    token_fields = [instance.__dict__.get(field) for field in TOKEN_FIELDS]
+    if not created and token_fields != instance._token_fields:
+        UserProfile.objects.filter(pk=instance.pk).update(token_version=F('token_version') + 1)
+        instance.token_version += 1
+        forget_token_versions(instance.pk)
+    instance._token_fields = token_fields
+
+
+@receiver(post_save, sender=UserProfile)
+def update_member_stats(sender, instance, created, **kwargs):
+    stat_fields = [instance.__dict__.get(field) for field in STAT_FIELDS]
+    if created:
+        member_stats.record_members([stat_fields])
+    elif stat_fields != instance._stat_fields:
+        member_stats.move_member(instance._stat_fields, stat_fields)
+    instance._stat_fields = stat_fields
+
+
+@receiver(post_delete, sender=UserProfile)
+def revoke_tokens_on_delete(sender, instance, **kwargs):
+    forget_token_versions(instance.pk)
+
+
+@receiver(post_delete, sender=UserProfile)
+def uncount_deleted_member(sender, instance, **kwargs):
+    member_stats.record_members([instance._stat_fields], sign=-1)
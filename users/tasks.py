@@ -0,0 +1,39 @@
+import logging
+
+from django.core.mail import send_mail
+
+from users.models import UserProfile
+from users.serializers.profile_serializer import UserProfileSerializer
+from users.utils.response_cache import cached_payload, profile_namespace
+from users.utils.task_queue import task
+
+WELCOME_MEMBER = 'users.welcome_member'
+MEMBER_APPROVED = 'users.member_approved'
+
+logger = logging.getLogger(__name__)
+
+
+def _notify(user_id, subject, message):
+    user = UserProfile.objects.filter(pk=user_id).values('email', 'full_name', 'username').first()
+    if user is None:
+        # Deleted since the task was queued; nothing to do.
+        return
+    send_mail(subject, message.format(name=user['full_name'] or user['username']), None, [user['email']])
+
+
+@task(WELCOME_MEMBER)
+def welcome_member(user_id):
+    _notify(user_id, 'Welcome to MMS', 'Hi {name}, your registration was received and is awaiting approval.')
+
+
+@task(MEMBER_APPROVED)
+def member_approved(user_id):
+    _notify(user_id, 'Your MMS membership is approved', 'Hi {name}, your membership has been approved.')
+    # Warm the profile the member is about to fetch; approval invalidated the old entry.
+    # Best effort: the email is sent, and failing here would retry the task and send it again.
+    try:
+        user = UserProfile.objects.filter(pk=user_id).first()
+        if user is not None:
+            cached_payload(f'profile:{user_id}', [profile_namespace(user_id)], lambda: UserProfileSerializer(user).data)
+    except Exception:
+        logger.exception('Could not warm the profile cache for member %s', user_id)
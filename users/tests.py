@@ -1,3 +1,1118 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import signal
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.hashers import make_password
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection
+from django.db.models import F
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path
+from django.utils import timezone
+from rest_framework.routers import DefaultRouter
+from rest_framework.test import APIClient
+
+from MMS import openapi
+from MMS.db_router import PrimaryReplicaRouter, primary_pinning_middleware
+from MMS.metrics import metrics_view, registry
+from MMS.query_inspector import record_queries
+from users.management.commands.import_profile import parse_importtime
+from users.managers.managers import ALREADY_APPROVED, APPROVED, UserProfileManager, members_approved
+from users.models import UserProfile
+from users.models.member_stat_model import MemberStat
+from users.models.revoked_token_model import RevokedToken
+from users.models.task_model import Task
+from users.models.user_rank_model import UserRank
+from users.serializers.member_list_serializer import member_rows, serialize_members
+from users.serializers.profile_serializer import UserProfileSerializer, duplicate_user_error
+from users.tasks import WELCOME_MEMBER
+from users.utils import member_stats, rank_cache, task_queue
+from users.utils.authentication import TokenUserProfile
+from users.utils.renderers import EnvelopeJSONRenderer
+from users.utils.task_queue import enqueue
+from users.utils.throttling import IPThrottle, UsernameThrottle
+from users.utils.tokens import MemberRefreshToken, get_token_version
+from users.utils.user_import import import_users
+from users.utils.response_cache import bump_versions, cached_payload, MEMBERS_NAMESPACE
+from users.views.async_user_view import AsyncUserViewSet, AsyncUserLoginView
+
+async_router = DefaultRouter()
+async_router.register('users', AsyncUserViewSet, basename='users')
+
+# URLconf for the async view tests, used through override_settings(ROOT_URLCONF='users.tests')
+urlpatterns = [
+    path('', include(async_router.urls)),
+    path('users/login/', AsyncUserLoginView.as_view()),
+]
+
+
+def create_members(count, rank=None, start=0, **extra_fields):
+    password = make_password('password')
+    bump_versions(MEMBERS_NAMESPACE)
+    return UserProfile.objects.bulk_create([
+        UserProfile(
+            email=f'member{i}@example.com',
+            username=f'member{i}',
+            password=password,
+            full_name=f'Member {i}',
+            rank=rank,
+            **extra_fields,
+        )
+        for i in range(start, start + count)
+    ])
+
+
+# Replica aliases are TEST MIRRORs on separate connections that can't see TestCase's
+# uncommitted transaction, so reads stay on default here; the router is tested directly.
+# Tests run in one process, so the cache timeouts are those of a shared cache.
+@override_settings(DATABASE_REPLICAS=[], TOKEN_VERSION_CACHE_TIMEOUT=60 * 60, RANK_CACHE_TIMEOUT=None,
+                   RESPONSE_CACHE_TIMEOUT=60 * 60, RESPONSE_CACHE_VERSION_TIMEOUT=None)
+class UsersTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['throttle'].clear()
+        rank_cache.invalidate()
+
+    @contextmanager
+    def assertQueryBudget(self, budget, repeat_threshold=3):
+        """Fail if the block runs more than budget queries or repeats one query shape (N+1)"""
+        with record_queries() as recorder:
+            yield recorder
+        self.assertLessEqual(len(recorder), budget, recorder.report(repeat_threshold))
+        self.assertEqual(recorder.repeated(repeat_threshold), [], recorder.report(repeat_threshold))
+
+
+class MemberListingTests(UsersTestCase):
+    def setUp(self):
+        super().setUp()
+        self.rank = UserRank.objects.create(name='Captain')
+        self.admin = UserProfile.objects.create_user('admin@example.com', 'admin', 'password', role='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_all_members_is_cursor_paginated(self):
+        create_members(60, rank=self.rank)
+
+        response = self.client.get('/users/all_members/')
+        data = response.json()['data']
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(data['results']), 50)
+        self.assertEqual(data['results'][1]['rank'], {'id': self.rank.id, 'name': 'Captain'})
+        self.assertIsNone(data['previous'])
+
+        response = self.client.get(data['next'])
+        self.assertEqual(len(response.json()['data']['results']), 11)
+
+    def test_listing_query_count_does_not_grow_with_rows(self):
+        rank_cache.get_ranks()
+        for start, count in [(0, 5), (5, 200)]:
+            create_members(count, rank=self.rank, start=start, is_approved=True)
+            for url in ['/users/all_members/', '/users/approved_members/', '/users/new_members/']:
+                with self.assertNumQueries(1):
+                    self.client.get(url)
+
+    def test_listing_is_revalidated_with_etag(self):
+        create_members(3)
+
+        response = self.client.get('/users/all_members/')
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/users/all_members/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.client.post('/users/approve_members/', {'all_pending': True}, format='json')
+        response = self.client.get('/users/all_members/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_listings_filter_search_and_sort(self):
+        create_members(3, rank=self.rank, is_approved=True)
+        create_members(2, start=3, role=UserProfile.STAFF)
+        UserProfile.objects.filter(username='member4').update(full_name='Jane Smith', phone='+15550199')
+
+        def usernames(url):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            return [row['username'] for row in response.json()['data']['results']]
+
+        self.assertEqual(usernames('/users/new_members/'), ['admin', 'member3', 'member4'])
+        self.assertEqual(usernames(f'/users/all_members/?rank_id={self.rank.id}&ordering=-username'),
+                         ['member2', 'member1', 'member0'])
+        self.assertEqual(usernames('/users/all_members/?role=staff&is_approved=false'), ['member3', 'member4'])
+        self.assertEqual(usernames('/users/all_members/?search=smith'), ['member4'])
+        self.assertEqual(usernames('/users/all_members/?search=5550199'), ['member4'])
+        self.assertEqual(self.client.get('/users/all_members/?ordering=password').status_code, 400)
+
+    def test_sorted_listing_cursor_walks_every_row_once(self):
+        create_members(7)
+        url, seen = '/users/all_members/?ordering=-email&page_size=3', []
+        while url:
+            data = self.client.get(url).json()['data']
+            seen += [row['email'] for row in data['results']]
+            url = data['next']
+        self.assertEqual(seen, sorted(UserProfile.objects.values_list('email', flat=True), reverse=True))
+
+    def test_listing_rows_render_like_the_model_serializer(self):
+        create_members(3, rank=self.rank)
+        create_members(2, start=3, phone='+15550100', is_approved=True)
+        members = UserProfile.objects.order_by('id')
+
+        renderer = EnvelopeJSONRenderer()
+        self.assertEqual(
+            renderer.render(serialize_members(member_rows(members))),
+            renderer.render(UserProfileSerializer(members, many=True).data),
+        )
+
+    def test_export_members_streams_every_format(self):
+        create_members(3, rank=self.rank)
+
+        response = self.client.get('/users/export_members/')
+        body = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(body['message'], 'All members exported successfully')
+        self.assertEqual(len(body['data']), 4)
+        self.assertEqual(body['data'][1]['rank'], {'id': self.rank.id, 'name': 'Captain'})
+
+        response = self.client.get('/users/export_members/', {'file_format': 'ndjson'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(json.loads(lines[0])['status'], 200)
+        self.assertEqual(len(lines), 5)
+
+        response = self.client.get('/users/export_members/', {'file_format': 'csv'})
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(rows[0].split(',')[-2:], ['rank_name', 'is_approved'])
+        self.assertEqual(len(rows), 5)
+
+
+class MemberApprovalTests(UsersTestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = UserProfile.objects.create_user('staff@example.com', 'staff', 'password', role='staff')
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def test_approve_member_outcomes(self):
+        member = create_members(1)[0]
+
+        self.assertEqual(self.client.post('/users/approve_member/', {'user_id': member.id}).status_code, 200)
+        self.assertEqual(self.client.post('/users/approve_member/', {'user_id': member.id}).status_code, 400)
+        self.assertEqual(self.client.post('/users/approve_member/', {'user_id': 0}).status_code, 404)
+        self.assertEqual(self.client.post('/users/approve_member/', {}).status_code, 400)
+
+    def test_bulk_approve_uses_one_lookup_and_one_update(self):
+        pending, approved = create_members(2), create_members(1, start=2, is_approved=True)
+
+        user_ids = [pending[0].id, pending[1].id, approved[0].id, 0]
+        with self.assertNumQueries(6):  # savepoint, locking lookup, UPDATE, release, stats UPDATE, task INSERT
+            response = self.client.post('/users/approve_members/', {'user_ids': user_ids}, format='json')
+        self.assertEqual(response.json()['data']['results'], [
+            {'user_id': pending[0].id, 'outcome': 'approved'},
+            {'user_id': pending[1].id, 'outcome': 'approved'},
+            {'user_id': approved[0].id, 'outcome': 'already_approved'},
+            {'user_id': 0, 'outcome': 'not_found'},
+        ])
+        self.assertFalse(UserProfile.objects.filter(role='member', is_approved=False).exists())
+
+    def test_bulk_approve_by_filter(self):
+        create_members(3)
+
+        response = self.client.post('/users/approve_members/', {'role': 'member'}, format='json')
+        self.assertEqual(response.json()['data']['approved_count'], 3)
+        self.assertEqual(self.client.post('/users/approve_members/', {}, format='json').status_code, 400)
+
+
+@override_settings(PASSWORD_HASHER_PARAMS={'pbkdf2': {'iterations': 1000}})
+class MemberStatsTests(UsersTestCase):
+    def setUp(self):
+        super().setUp()
+        self.ranks = [UserRank.objects.create(name='Captain'), UserRank.objects.create(name='Major')]
+        self.admin = UserProfile.objects.create_user('admin@example.com', 'admin', 'password', role='admin', is_approved=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_signals_keep_stats_in_step_with_the_members_table(self):
+        members = [
+            UserProfile.objects.create_user(f'member{i}@example.com', f'member{i}', 'password', rank=self.ranks[i % 2])
+            for i in range(4)
+        ]
+        UserProfile.objects.approve_members([members[0].id, members[1].id])
+        members[2].role = UserProfile.STAFF
+        members[2].save()
+        members[3].delete()
+        self.ranks[1].delete()
+        import_users([{'email': 'imported@example.com', 'username': 'imported', 'password': 'secret123',
+                       'rank_id': self.ranks[0].id}], workers=1)
+
+        self.assertEqual(member_stats.find_drift(), {})
+        rank_cache.get_ranks()
+        with self.assertNumQueries(1):
+            data = self.client.get('/users/stats/').json()['data']
+        self.assertEqual(data['total'], 5)
+        self.assertEqual(data['pending_approvals'], 2)
+        self.assertEqual(data['by_role'], {'admin': 1, 'staff': 1, 'member': 3})
+        self.assertEqual(data['by_rank'], [
+            {'rank': {'id': self.ranks[0].id, 'name': 'Captain'}, 'count': 3},
+            {'rank': None, 'count': 2},
+        ])
+
+    def test_concurrent_approvals_are_counted_once(self):
+        members = create_members(2)
+        member_stats.rebuild()
+        approval_lookup = UserProfileManager._approval_lookup
+        signalled = []
+        members_approved.connect(lambda user_ids, **kwargs: signalled.extend(user_ids),
+                                 weak=False, dispatch_uid='tests')
+        self.addCleanup(members_approved.disconnect, dispatch_uid='tests')
+
+        def approved_elsewhere_first(manager, *args):
+            # Another request approves the first member before our lookup locks the rows
+            UserProfile.objects.filter(pk=members[0].pk).update(is_approved=True)
+            member_stats.record_approvals(1)
+            return approval_lookup(manager, *args)
+
+        with patch.object(UserProfileManager, '_approval_lookup', approved_elsewhere_first):
+            outcomes = UserProfile.objects.approve_members([member.id for member in members])
+        self.assertEqual(outcomes, {members[0].id: ALREADY_APPROVED, members[1].id: APPROVED})
+        self.assertEqual(signalled, [members[1].id])
+        self.assertEqual(member_stats.find_drift(), {})
+
+    def test_filtered_approval_only_updates_the_members_it_looked_up(self):
+        late = create_members(3)[2]
+        approval_lookup = UserProfileManager._approval_lookup
+
+        def registered_after_the_lookup(manager, *args):
+            user_ids, lookup = approval_lookup(manager, *args)
+            return user_ids, lookup.exclude(pk=late.pk)
+
+        with patch.object(UserProfileManager, '_approval_lookup', registered_after_the_lookup):
+            outcomes = UserProfile.objects.approve_members(role=UserProfile.MEMBER)
+        self.assertEqual(len(outcomes), 2)
+        self.assertFalse(UserProfile.objects.get(pk=late.pk).is_approved)
+
+    def test_seeded_members_are_counted(self):
+        call_command('seed_members', '--members', 50, '--ranks', 3, '--staff', 2, stdout=io.StringIO())
+
+        self.assertEqual(UserProfile.objects.filter(username__startswith='bench').count(), 50)
+        self.assertEqual(UserProfile.objects.filter(role=UserProfile.STAFF, is_approved=True).count(), 2)
+        self.assertEqual(member_stats.find_drift(), {})
+
+    def test_rebuild_fixes_drift(self):
+        create_members(3, rank=self.ranks[0])
+        self.assertEqual(member_stats.find_drift()[MemberStat.RANK, str(self.ranks[0].id)], (0, 3))
+
+        with self.assertRaises(CommandError):
+            call_command('member_stats', stderr=io.StringIO())
+        call_command('member_stats', '--rebuild', stdout=io.StringIO())
+        self.assertEqual(member_stats.find_drift(), {})
+
+
+@override_settings(PASSWORD_HASHER_PARAMS={'pbkdf2': {'iterations': 1000}})
+class TaskQueueTests(UsersTestCase):
+    def setUp(self):
+        super().setUp()
+        self.rank = UserRank.objects.create(name='Captain')
+        self.staff = UserProfile.objects.create_user('staff@example.com', 'staff', 'password', role='staff')
+        self.client = APIClient()
+
+    def test_register_and_approval_queue_notifications_once(self):
+        data = {'email': 'new@example.com', 'username': 'new', 'password': 'secret', 'rank_id': self.rank.id}
+        user_id = self.client.post('/users/register/', data).json()['data']['user']['id']
+        self.assertEqual(len(mail.outbox), 0)
+
+        self.client.force_authenticate(self.staff)
+        self.client.post('/users/approve_member/', {'user_id': user_id})
+        UserProfile.objects.approve_members([user_id])
+        enqueue(WELCOME_MEMBER, {'user_id': user_id}, key=f'welcome:{user_id}')
+
+        self.assertEqual(task_queue.run_pending(), [Task.DONE, Task.DONE])
+        self.assertEqual([message.subject for message in mail.outbox],
+                         ['Welcome to MMS', 'Your MMS membership is approved'])
+        self.assertEqual(task_queue.run_pending(), [])
+
+    def test_failures_back_off_then_give_up(self):
+        calls = []
+        task_queue.task('tests.flaky')(lambda: calls.append(1) or 1 / 0)
+        self.addCleanup(task_queue.registry.pop, 'tests.flaky')
+        enqueue('tests.flaky')
+
+        for attempt in range(1, settings.TASK_MAX_ATTEMPTS + 1):
+            outcome = Task.PENDING if attempt < settings.TASK_MAX_ATTEMPTS else Task.FAILED
+            self.assertEqual(task_queue.run_pending(), [outcome])
+            queued = Task.objects.get()
+            self.assertEqual(queued.attempts, attempt)
+            self.assertIn('ZeroDivisionError', queued.last_error)
+            if outcome == Task.PENDING:
+                self.assertGreater(queued.run_at, timezone.now())
+                self.assertEqual(task_queue.run_pending(), [])
+                Task.objects.update(run_at=timezone.now())
+        self.assertEqual(len(calls), settings.TASK_MAX_ATTEMPTS)
+
+    def test_expired_leases_are_reclaimed(self):
+        enqueue(WELCOME_MEMBER, {'user_id': self.staff.id})
+        self.assertEqual(len(task_queue.claim_tasks('crashed-worker', 10)), 1)
+        self.assertEqual(task_queue.claim_tasks('other-worker', 10), [])
+
+        Task.objects.update(locked_at=timezone.now() - timedelta(seconds=settings.TASK_LEASE_SECONDS + 1))
+        self.assertEqual(task_queue.run_pending('other-worker'), [Task.DONE])
+
+    def test_an_overrun_lease_does_not_overwrite_the_reclaiming_run(self):
+        def overrun():
+            # The lease expires mid-run and another worker reclaims the task
+            Task.objects.update(locked_at=timezone.now() - timedelta(seconds=settings.TASK_LEASE_SECONDS + 1))
+            self.assertEqual(len(task_queue.claim_tasks('other-worker', 10)), 1)
+
+        task_queue.task('tests.overrun')(overrun)
+        self.addCleanup(task_queue.registry.pop, 'tests.overrun')
+        enqueue('tests.overrun')
+
+        self.assertEqual(task_queue.run_pending('slow-worker'), [None])
+        queued = Task.objects.get()
+        self.assertEqual((queued.status, queued.locked_by), (Task.RUNNING, 'other-worker'))
+
+    def test_worker_command_reports_lost_leases(self):
+        def overrun():
+            Task.objects.update(locked_at=timezone.now() - timedelta(seconds=settings.TASK_LEASE_SECONDS + 1))
+            task_queue.claim_tasks('other-worker', 10)
+
+        task_queue.task('tests.overrun')(overrun)
+        self.addCleanup(task_queue.registry.pop, 'tests.overrun')
+        for signum in [signal.SIGTERM, signal.SIGINT]:
+            self.addCleanup(signal.signal, signum, signal.getsignal(signum))
+        enqueue('tests.overrun')
+
+        stdout = io.StringIO()
+        call_command('run_tasks', '--burst', stdout=stdout)
+        self.assertIn('0 done, 0 retrying, 0 failed, 1 lost to another worker', stdout.getvalue())
+
+    def test_a_failed_cache_warm_up_does_not_resend_the_approval_email(self):
+        UserProfile.objects.approve_members([self.staff.id])
+        with patch('users.tasks.cached_payload', side_effect=ConnectionError), self.assertLogs('users.tasks', 'ERROR'):
+            self.assertEqual(task_queue.run_pending(), [Task.DONE])
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class UserImportTests(UsersTestCase):
+    def setUp(self):
+        super().setUp()
+        self.rank = UserRank.objects.create(name='Captain')
+        self.admin = UserProfile.objects.create_user('admin@example.com', 'admin', 'password', role='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_import_reports_row_errors_and_creates_valid_rows(self):
+        upload = SimpleUploadedFile('users.csv', (
+            'email,username,password,rank_id\n'
+            f'a@example.com,a,secret,{self.rank.id}\n'
+            'admin@example.com,b,secret,\n'
+            'c@example.com,a,secret,\n'
+            'not-an-email,d,secret,\n'
+            'e@example.com,e,secret,999\n'
+        ).encode())
+
+        response = self.client.post('/users/import_users/', {'file': upload})
+        self.assertEqual(response.status_code, 201)
+        report = response.json()['data']
+        self.assertEqual(report['created'], 1)
+        self.assertEqual([error['row'] for error in report['errors']], [1, 2, 3, 4])
+        user = UserProfile.objects.get(username='a')
+        self.assertEqual(user.rank_id, self.rank.id)
+        self.assertTrue(user.check_password('secret'))
+
+    def test_import_json_body_dry_run(self):
+        rows = [{'email': f'u{i}@example.com', 'username': f'u{i}', 'password': 'secret'} for i in range(3)]
+
+        response = self.client.post('/users/import_users/?dry_run=1', {'users': rows}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['valid'], 3)
+        self.assertFalse(UserProfile.objects.filter(username='u0').exists())
+
+    def test_import_bare_list_body(self):
+        rows = [{'email': f'u{i}@example.com', 'username': f'u{i}', 'password': 'secret'} for i in range(2)]
+
+        response = self.client.post('/users/import_users/?dry_run=true', rows, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(UserProfile.objects.filter(username='u0').exists())
+
+        response = self.client.post('/users/import_users/', rows, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(UserProfile.objects.filter(username__in=['u0', 'u1']).count(), 2)
+
+    def test_import_rejects_bad_encodings_and_missing_rank_zero(self):
+        upload = SimpleUploadedFile('users.csv', 'email,username,password\né@example.com,é,secret\n'.encode('latin-1'))
+        response = self.client.post('/users/import_users/', {'file': upload})
+        self.assertEqual(response.status_code, 400)
+
+        rows = [{'email': 'u0@example.com', 'username': 'u0', 'password': 'secret', 'rank_id': 0}]
+        report = self.client.post('/users/import_users/', rows, format='json').json()['data']
+        self.assertEqual((report['created'], list(report['errors'][0]['errors'])), (0, ['rank_id']))
+
+    def test_rows_taken_by_a_concurrent_import_are_reported(self):
+        rows = [{'email': f'u{i}@example.com', 'username': f'u{i}', 'password': 'secret'} for i in range(3)]
+
+        def registered_meanwhile(passwords, workers=None):
+            UserProfile.objects.create_user('other@example.com', 'u1', 'password')
+            return [make_password(password) for password in passwords]
+
+        with patch('users.utils.user_import.hash_passwords', registered_meanwhile):
+            report = import_users(rows)
+        self.assertEqual(report['created'], 2)
+        self.assertEqual(report['errors'], [{'row': 1, 'errors': {'username': ['user profile with this username already exists.']}}])
+        self.assertEqual(member_stats.find_drift(), {})
+
+
+class RankCacheTests(UsersTestCase):
+    def setUp(self):
+        super().setUp()
+        self.rank = UserRank.objects.create(name='Captain')
+        self.client = APIClient()
+
+    def test_rank_reads_are_served_from_cache(self):
+        rank_cache.get_ranks()
+        with self.assertNumQueries(0):
+            response = self.client.get('/ranks/')
+        self.assertEqual(response.json()['data'], [{'id': self.rank.id, 'name': 'Captain'}])
+
+    def test_rank_changes_invalidate_cache(self):
+        rank_cache.get_ranks()
+        self.rank.name = 'Major'
+        self.rank.save()
+        other = UserRank.objects.create(name='Colonel')
+
+        self.assertEqual(rank_cache.get_rank(self.rank.id)['name'], 'Major')
+        other.delete()
+        self.assertIsNone(rank_cache.get_rank(other.id))
+
+    def test_changes_elsewhere_are_seen_once_local_entries_expire(self):
+        with self.settings(RANK_CACHE_TIMEOUT=0.05, RANK_CACHE_LOCAL_TTL=0):
+            cache.clear()
+            rank_cache.get_ranks()
+            # Another worker's rename: the row changes, but this process' cache isn't told.
+            UserRank.objects.filter(pk=self.rank.pk).update(name='Major')
+            self.assertEqual(rank_cache.get_rank(self.rank.id)['name'], 'Captain')
+            time.sleep(0.1)
+            self.assertEqual(rank_cache.get_rank(self.rank.id)['name'], 'Major')
+
+    def test_register_validates_rank_without_querying_ranks(self):
+        rank_cache.get_ranks()
+        data = {'email': 'new@example.com', 'username': 'new', 'password': 'secret', 'rank_id': self.rank.id}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/users/register/', data)
+        self.assertFalse([query for query in queries if 'users_userrank' in query['sql']])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['data']['user']['rank'], {'id': self.rank.id, 'name': 'Captain'})
+        self.assertEqual(self.client.post('/users/register/', {**data, 'email': 'x@example.com', 'username': 'x', 'rank_id': 999}).status_code, 400)
+
+
+class ProfileCacheTests(UsersTestCase):
+    def setUp(self):
+        super().setUp()
+        self.member = UserProfile.objects.create_user('member@example.com', 'member', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.member)
+
+    def test_profile_conditional_get(self):
+        response = self.client.get('/users/profile/')
+        etag = response['ETag']
+        self.assertEqual(response.json()['data']['username'], 'member')
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/users/profile/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_profile_version_bumps_on_update_and_approval(self):
+        etag = self.client.get('/users/profile/')['ETag']
+        self.client.put('/users/update_profile/', {'full_name': 'New Name'}, format='json')
+        self.member.refresh_from_db()
+
+        response = self.client.get('/users/profile/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['full_name'], 'New Name')
+
+        etag = response['ETag']
+        UserProfile.objects.approve_members([self.member.id])
+        self.member.refresh_from_db()
+        response = self.client.get('/users/profile/', HTTP_IF_NONE_MATCH=etag)
+        self.assertTrue(response.json()['data']['is_approved'])
+
+    def test_updates_elsewhere_are_seen_once_local_entries_expire(self):
+        self.client.force_authenticate(None)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {MemberRefreshToken.for_user(self.member).access_token}')
+        with self.settings(RESPONSE_CACHE_TIMEOUT=0.05, RESPONSE_CACHE_VERSION_TIMEOUT=0.05):
+            cache.clear()
+            etag = self.client.get('/users/profile/')['ETag']
+            # Another worker's update: the row changes, but this process' versions aren't bumped.
+            UserProfile.objects.filter(pk=self.member.pk).update(full_name='Elsewhere')
+            self.assertEqual(self.client.get('/users/profile/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            time.sleep(0.1)
+            response = self.client.get('/users/profile/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.json()['data']['full_name'], 'Elsewhere')
+
+
+class StatelessAuthenticationTests(UsersTestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = UserProfile.objects.create_user('staff@example.com', 'staff', 'password', role='staff')
+        self.client = APIClient()
+        access = self.client.post('/users/login/', {'username': 'staff', 'password': 'password'}).json()['data']['tokens']['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def test_listing_permission_check_needs_no_auth_query(self):
+        rank_cache.get_ranks()
+        self.client.get('/users/all_members/')
+        bump_versions(MEMBERS_NAMESPACE)
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/users/all_members/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_role_change_revokes_tokens(self):
+        self.assertEqual(self.client.get('/users/profile/').status_code, 200)
+
+        self.staff.role = UserProfile.MEMBER
+        self.staff.save()
+        response = self.client.get('/users/profile/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['message'], 'Session is expired or invalid')
+
+    def test_deactivation_revokes_tokens(self):
+        self.staff.is_active = False
+        self.staff.save()
+        self.assertEqual(self.client.get('/users/profile/').status_code, 401)
+
+    def test_approval_is_read_from_the_database_not_the_token(self):
+        token = MemberRefreshToken.for_user(self.staff).access_token
+        UserProfile.objects.approve_members([self.staff.id])
+        self.assertTrue(TokenUserProfile(token).is_approved)
+
+    def test_revocation_elsewhere_is_seen_once_the_local_entry_expires(self):
+        with self.settings(TOKEN_VERSION_CACHE_TIMEOUT=0.05):
+            cache.clear()
+            self.assertEqual(self.client.get('/users/profile/').status_code, 200)
+            # Another worker's role change: the row changes, but this process' cache isn't told.
+            UserProfile.objects.filter(pk=self.staff.pk).update(role=UserProfile.MEMBER, token_version=F('token_version') + 1)
+            time.sleep(0.1)
+            self.assertEqual(self.client.get('/users/profile/').status_code, 401)
+
+    def test_unrelated_changes_keep_tokens_valid(self):
+        self.staff.full_name = 'Staff Member'
+        self.staff.save()
+        response = self.client.get('/users/profile/')
+        self.assertEqual(response.json()['data']['full_name'], 'Staff Member')
+
+
+class RefreshTokenTests(UsersTestCase):
+    def setUp(self):
+        super().setUp()
+        self.member = UserProfile.objects.create_user('member@example.com', 'member', 'password')
+        self.client = APIClient()
+        self.refresh = str(MemberRefreshToken.for_user(self.member))
+
+    def refresh_tokens(self, refresh):
+        return self.client.post('/users/token/refresh/', {'refresh': refresh}, format='json')
+
+    def test_refresh_rotates_and_rejects_reuse(self):
+        get_token_version(self.member.pk)
+        with self.assertQueryBudget(3):  # savepoint, revocation INSERT, release
+            response = self.refresh_tokens(self.refresh)
+        self.assertEqual(response.status_code, 200)
+        tokens = response.json()['data']['tokens']
+
+        self.assertEqual(self.refresh_tokens(self.refresh).status_code, 401)
+        cache.clear()
+        self.assertEqual(self.refresh_tokens(self.refresh).status_code, 401)
+        self.assertEqual(self.refresh_tokens(tokens['refresh']).status_code, 200)
+
+    def test_role_change_revokes_refresh_tokens(self):
+        self.member.role = UserProfile.STAFF
+        self.member.save()
+        self.assertEqual(self.refresh_tokens(self.refresh).status_code, 401)
+
+    def test_purge_drops_only_expired_entries(self):
+        now = timezone.now()
+        RevokedToken.objects.bulk_create([
+            RevokedToken(jti='expired', user=self.member, expires_at=now - timedelta(minutes=1)),
+            RevokedToken(jti='live', user=self.member, expires_at=now + timedelta(days=1)),
+        ])
+        call_command('purge_revoked_tokens', stdout=io.StringIO())
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)), ['live'])
+
+
+class PasswordHashingTests(UsersTestCase):
+    @override_settings(PASSWORD_HASHER_PARAMS={'pbkdf2': {'iterations': 1000}})
+    def create_member(self):
+        return UserProfile.objects.create_user('member@example.com', 'member', 'password')
+
+    @override_settings(PASSWORD_HASHER_PARAMS={'pbkdf2': {'iterations': 2000}})
+    def test_login_upgrades_outdated_hashes(self):
+        member = self.create_member()
+        self.assertTrue(member.password.startswith('pbkdf2_sha256$1000$'))
+
+        response = APIClient().post('/users/login/', {'username': 'member', 'password': 'password'})
+        self.assertEqual(response.status_code, 200)
+        member.refresh_from_db()
+        self.assertTrue(member.password.startswith('pbkdf2_sha256$2000$'))
+
+
+@override_settings(PASSWORD_HASHER_PARAMS={'pbkdf2': {'iterations': 1000}})
+class LoginTests(UsersTestCase):
+    def setUp(self):
+        super().setUp()
+        self.rank = UserRank.objects.create(name='Captain')
+        self.member = UserProfile.objects.create_user('member@example.com', 'member', 'password', rank=self.rank)
+        self.client = APIClient()
+
+    def test_login_is_one_query_and_primes_the_profile_cache(self):
+        rank_cache.get_ranks()
+        with self.assertQueryBudget(1):
+            response = self.client.post('/users/login/', {'username': 'member', 'password': 'password'})
+        data = response.json()['data']
+        self.assertEqual(data['user']['rank'], {'id': self.rank.id, 'name': 'Captain'})
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {data['tokens']['access']}")
+        with self.assertQueryBudget(1):  # token version only; the payload comes from the login
+            self.assertEqual(self.client.get('/users/profile/').json()['data'], data['user'])
+
+    def test_login_failures(self):
+        def login(**data):
+            return self.client.post('/users/login/', data).status_code
+
+        self.assertEqual(login(username='member', password='wrong'), 401)
+        self.assertEqual(login(username='nobody', password='password'), 401)
+        self.assertEqual(login(username='member'), 400)
+        self.member.is_active = False
+        self.member.save()
+        self.assertEqual(login(username='member', password='password'), 401)
+
+    def test_malformed_bodies_are_rejected(self):
+        for urlconf in ['MMS.urls', 'users.tests']:
+            with self.settings(ROOT_URLCONF=urlconf):
+                for body in [[1, 2], {'username': 'nobody', 'password': 123}, {'username': ['member'], 'password': 'password'}]:
+                    self.assertEqual(self.client.post('/users/login/', body, format='json').status_code, 400)
+
+
+@override_settings(PASSWORD_HASHER_PARAMS={'pbkdf2': {'iterations': 1000}})
+class ThrottlingTests(UsersTestCase):
+    def setUp(self):
+        super().setUp()
+        UserProfile.objects.create_user('member@example.com', 'member', 'password')
+        self.client = APIClient()
+        rates = {'login_ip': '5/min', 'login_username': '3/min', 'register_ip': '2/hour'}
+        self.settings = override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates})
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+
+    def login(self, username='member', password='wrong', address='10.0.0.1'):
+        return self.client.post('/users/login/', {'username': username, 'password': password}, REMOTE_ADDR=address)
+
+    def test_username_limit_applies_across_addresses(self):
+        for attempt in range(3):
+            self.assertEqual(self.login(address=f'10.0.0.{attempt}').status_code, 401)
+
+        with self.assertNumQueries(0):
+            response = self.login(password='password', address='10.0.0.9')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json()['message'], 'Too many requests, please try again later')
+        self.assertEqual(response['Retry-After'], str(response.json()['data']['retry_after']))
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual(self.login(username='other', address='10.0.0.9').status_code, 401)
+
+    def test_ip_limit_spares_other_clients(self):
+        for attempt in range(5):
+            self.assertEqual(self.login(username=f'guess{attempt}').status_code, 401)
+        self.assertEqual(self.login(username='guess9').status_code, 429)
+        self.assertEqual(self.login(password='password', address='10.0.0.2').status_code, 200)
+
+    def test_forwarded_for_is_ignored_without_declared_proxies(self):
+        for attempt in range(5):
+            self.client.post('/users/login/', {'username': f'guess{attempt}', 'password': 'wrong'},
+                             REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=f'203.0.113.{attempt}')
+        response = self.client.post('/users/login/', {'username': 'guess9', 'password': 'wrong'},
+                                    REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='203.0.113.99')
+        self.assertEqual(response.status_code, 429)
+
+    def test_username_throttle_skips_non_object_bodies(self):
+        request = type('Request', (), {'data': [1, 2]})()
+        self.assertIsNone(UsernameThrottle().get_ident_key(request))
+
+    def test_register_is_limited_per_ip(self):
+        for attempt in range(2):
+            self.client.post('/users/register/', {'email': f'new{attempt}@example.com', 'username': f'new{attempt}',
+                                                  'password': 'secret'})
+        response = self.client.post('/users/register/', {'email': 'new2@example.com', 'username': 'new2',
+                                                         'password': 'secret'})
+        self.assertEqual(response.status_code, 429)
+        self.assertFalse(UserProfile.objects.filter(username='new2').exists())
+
+    def test_previous_window_is_weighted_by_overlap(self):
+        throttle = IPThrottle()
+        view = type('View', (), {'throttle_scope': 'login'})
+        request = RequestFactory().post('/users/login/', REMOTE_ADDR='10.0.0.1')
+        with patch('users.utils.throttling.time.time', return_value=60 * 1000 + 59):
+            self.assertEqual(sum(throttle.allow_request(request, view) for _ in range(6)), 5)
+        # 30s into the next window half of the previous five still count; after 6s more,
+        # 2 of them do, leaving room for one more request.
+        with patch('users.utils.throttling.time.time', return_value=60 * 1001 + 30):
+            self.assertEqual(sum(throttle.allow_request(request, view) for _ in range(6)), 3)
+            self.assertEqual(throttle.wait(), 6)
+
+
+@override_settings(ROOT_URLCONF='users.tests', PASSWORD_HASHER_PARAMS={'pbkdf2': {'iterations': 1000}})
+class AsyncViewTests(UsersTestCase):
+    def setUp(self):
+        super().setUp()
+        self.rank = UserRank.objects.create(name='Captain')
+        self.staff = UserProfile.objects.create_user('staff@example.com', 'staff', 'password', role='staff')
+
+    async def login(self, username, password):
+        return await self.async_client.post('/users/login/', {'username': username, 'password': password},
+                                            content_type='application/json')
+
+    async def test_register_login_and_profile(self):
+        data = {'email': 'new@example.com', 'username': 'new', 'password': 'secret', 'rank_id': self.rank.id}
+        response = await self.async_client.post('/users/register/', data, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['data']['user']['rank'], {'id': self.rank.id, 'name': 'Captain'})
+
+        self.assertEqual((await self.login('new', 'wrong')).status_code, 401)
+        self.assertEqual((await self.login('nobody', 'secret')).status_code, 401)
+        response = await self.login('new', 'secret')
+        self.assertEqual(response.status_code, 200)
+
+        access = response.json()['data']['tokens']['access']
+        response = await self.async_client.get('/users/profile/', headers={'Authorization': f'Bearer {access}'})
+        self.assertEqual(response.json()['data']['email'], 'new@example.com')
+        response = await self.async_client.get('/users/profile/', headers={
+            'Authorization': f'Bearer {access}', 'If-None-Match': response['ETag'],
+        })
+        self.assertEqual(response.status_code, 304)
+
+    async def test_profile_with_a_cold_rank_cache(self):
+        await UserProfile.objects.filter(pk=self.staff.pk).aupdate(rank=self.rank)
+        access = (await self.login('staff', 'password')).json()['data']['tokens']['access']
+        cache.clear()
+        rank_cache.invalidate()
+
+        response = await self.async_client.get('/users/profile/', headers={'Authorization': f'Bearer {access}'})
+        self.assertEqual(response.json()['data']['rank'], {'id': self.rank.id, 'name': 'Captain'})
+
+    async def test_staff_actions(self):
+        member = (await UserProfile.objects.acreate(email='m@example.com', username='m'))
+        access = (await self.login('staff', 'password')).json()['data']['tokens']['access']
+        headers = {'Authorization': f'Bearer {access}'}
+
+        response = await self.async_client.post('/users/approve_member/', {'user_id': member.id},
+                                                content_type='application/json', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue((await UserProfile.objects.aget(pk=member.pk)).is_approved)
+
+        response = await self.async_client.get('/users/approved_members/', headers=headers)
+        self.assertEqual([row['id'] for row in response.json()['data']['results']], [member.id])
+
+        response = await self.async_client.get('/users/export_members/', {'file_format': 'ndjson'}, headers=headers)
+        lines = b''.join([chunk async for chunk in response.streaming_content]).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+
+        response = await self.async_client.put('/users/update_profile/', {'full_name': 'Staff'},
+                                               content_type='application/json', headers=headers)
+        self.assertEqual(response.json()['data']['full_name'], 'Staff')
+
+
+class RegistrationTests(UsersTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    @override_settings(PASSWORD_HASHER_PARAMS={'pbkdf2': {'iterations': 1000}})
+    def test_duplicates_are_caught_by_the_unique_constraints(self):
+        rank = UserRank.objects.create(name='Captain')
+        rank_cache.get_ranks()
+        data = {'email': 'new@example.com', 'username': 'new', 'password': 'secret', 'rank_id': rank.id}
+        with self.assertNumQueries(5):  # savepoint, INSERT, stats UPDATE, release, task INSERT
+            self.assertEqual(self.client.post('/users/register/', data).status_code, 201)
+
+        response = self.client.post('/users/register/', {**data, 'username': 'other'})
+        self.assertEqual(response.json()['message'], 'Email already registered')
+        response = self.client.post('/users/register/', {**data, 'email': 'other@example.com'})
+        self.assertEqual(response.json()['message'], 'Username already taken')
+        self.assertEqual(UserProfile.objects.count(), 1)
+
+    def test_other_integrity_errors_are_not_reported_as_duplicates(self):
+        not_null = IntegrityError('NOT NULL constraint failed: users_userprofile.email')
+        self.assertIsNone(duplicate_user_error(not_null))
+        # PostgreSQL reports the violated constraint in the driver error's diagnostics
+        for sqlstate, constraint, field in [('23505', 'users_userprofile_username_key', 'username'),
+                                            ('23505', 'users_userprofile_email_0a1b2c3d_uniq', 'email'),
+                                            ('23505', 'users_memberstat_bucket_unique', None),
+                                            ('23502', None, None)]:
+            error = IntegrityError()
+            error.__cause__ = Exception()
+            error.__cause__.diag = SimpleNamespace(sqlstate=sqlstate, constraint_name=constraint)
+            self.assertEqual(getattr(duplicate_user_error(error), 'field', None), field)
+
+        rank = UserRank.objects.create(name='Captain')
+        data = {'email': 'new@example.com', 'username': 'new', 'password': 'secret', 'rank_id': rank.id}
+        with patch.object(UserProfile.objects, 'create_user', side_effect=not_null):
+            with self.assertRaises(IntegrityError):
+                self.client.post('/users/register/', data)
+
+
+class QueryBudgetTests(UsersTestCase):
+    def setUp(self):
+        super().setUp()
+        self.ranks = [UserRank.objects.create(name=f'Rank {i}') for i in range(5)]
+        self.staff = UserProfile.objects.create_user('staff@example.com', 'staff', 'password', role='staff')
+        self.client = APIClient()
+        access = self.client.post('/users/login/', {'username': 'staff', 'password': 'password'}).json()['data']['tokens']['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def test_budgets_hold_as_members_grow(self):
+        created = 0
+        for size in [10, 1000, 10000]:
+            for rank in self.ranks:
+                create_members((size - created) // len(self.ranks), rank=rank, start=created)
+                created += (size - created) // len(self.ranks)
+            cache.clear()
+
+            with self.assertQueryBudget(3):  # token version, page, rank cache fill
+                self.assertEqual(self.client.get('/users/all_members/?page_size=500').status_code, 200)
+            with self.assertQueryBudget(1):  # profile row
+                self.assertEqual(self.client.get('/users/profile/').status_code, 200)
+            with self.assertQueryBudget(1):
+                self.assertEqual(self.client.get('/users/all_members/?search=member1&ordering=-email').status_code, 200)
+
+    def test_detector_reports_repeated_query_shapes(self):
+        create_members(4, rank=self.ranks[0])
+        with record_queries() as recorder:
+            for member in UserProfile.objects.all():
+                str(member.rank)
+
+        [(shape, count, stack)] = recorder.repeated(3)
+        self.assertIn('FROM "users_userrank" WHERE "users_userrank"."id" = ?', shape)
+        self.assertEqual(count, 4)
+        self.assertTrue(any(frame.name == 'test_detector_reports_repeated_query_shapes' for frame in stack))
+
+
+@override_settings(PASSWORD_HASHER_PARAMS={'pbkdf2': {'iterations': 1000}})
+class AdminChangelistTests(UsersTestCase):
+    url = '/admin/users/userprofile/'
+
+    def setUp(self):
+        super().setUp()
+        self.ranks = [UserRank.objects.create(name=f'Rank {i}') for i in range(3)]
+        self.superuser = UserProfile.objects.create_superuser('root@example.com', 'root', 'password')
+        for index, rank in enumerate(self.ranks):
+            create_members(100, rank=rank, start=index * 100, is_approved=index > 0)
+        member_stats.rebuild()
+        self.client.force_login(self.superuser)
+
+    def test_changelist_budget_does_not_grow_with_rows(self):
+        self.client.get(self.url)  # warm the rank cache
+        for query in ['', '?approval=pending', '?rank=none&p=2', '?q=member1', '?role=staff&approval=approved']:
+            with self.assertQueryBudget(5):  # session, user, stats, page, COUNT for search or combined filters
+                response = self.client.get(self.url + query)
+            self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['cl'].result_count, 301)
+        self.assertNotContains(response, 'pbkdf2_')
+        self.assertContains(response, 'Pending (101)')
+        self.assertEqual(self.client.get(self.url + '?q=member1').context['cl'].result_count, 111)
+
+    def test_bulk_actions_run_single_updates(self):
+        pending = UserProfile.objects.filter(is_approved=False).order_by('id').values_list('id', flat=True)[:50]
+        selected = [str(pk) for pk in pending]
+        with self.assertQueryBudget(9):  # session, user, stats, savepoint, lookup, UPDATE, release, stats, task
+            self.client.post(self.url, {'action': 'approve_selected', '_selected_action': selected})
+        self.assertEqual(UserProfile.objects.filter(is_approved=False).count(), 51)
+
+        member = UserProfile.objects.get(username='member150')
+        with self.assertQueryBudget(6):  # session, user, stats, lookup, UPDATE, stats UPDATE
+            self.client.post(self.url, {'action': 'make_staff', '_selected_action': [str(member.id), selected[0]]})
+        member.refresh_from_db()
+        self.assertEqual((member.role, member.token_version), ('staff', 1))
+        self.assertEqual(member_stats.find_drift(), {})
+
+
+@override_settings(PERF_METRICS_SAMPLE_RATE=1.0, PERF_METRICS_TOKEN='secret')
+class PerformanceMetricsTests(UsersTestCase):
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+        self.admin = UserProfile.objects.create_user('admin@example.com', 'admin', 'password', role='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_sampled_requests_report_server_timing_and_metrics(self):
+        create_members(3)
+        rank_cache.get_ranks()
+        response = self.client.get('/users/all_members/')
+        timings = dict(metric.split(';', 1) for metric in response['Server-Timing'].split(', '))
+        self.assertEqual(timings['sql'].split('desc=')[1], '"queries=1"')
+        self.assertIn('serialize', timings)
+        self.assertIn('render', timings)
+
+        metrics = self.scrape()
+        self.assertIn('mms_requests_total{view="users-all-members",method="GET",status="200"} 1', metrics)
+        self.assertIn('mms_sql_queries_total{view="users-all-members",method="GET"} 1', metrics)
+        self.assertIn(f'mms_response_bytes_total{{view="users-all-members",method="GET"}} {len(response.content)}', metrics)
+
+    def scrape(self):
+        request = RequestFactory().get('/metrics/', HTTP_AUTHORIZATION='Bearer secret')
+        return metrics_view(request).content.decode()
+
+    @override_settings(ROOT_URLCONF='users.tests')
+    async def test_async_views_count_queries_run_in_worker_threads(self):
+        await sync_to_async(create_members)(3)
+        access = await sync_to_async(lambda: str(MemberRefreshToken.for_user(self.admin).access_token))()
+        response = await self.async_client.get('/users/all_members/', headers={'Authorization': f'Bearer {access}'})
+        self.assertEqual(response.status_code, 200)
+        timings = dict(metric.split(';', 1) for metric in response['Server-Timing'].split(', '))
+        self.assertNotEqual(timings['sql'].split('desc=')[1], '"queries=0"')
+
+    @override_settings(PERF_METRICS_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_instrumented(self):
+        response = self.client.get('/users/all_members/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertNotIn('users-all-members', registry.render())
+
+    def test_metrics_endpoint_requires_the_token_when_set(self):
+        self.assertEqual(metrics_view(RequestFactory().get('/metrics/')).status_code, 403)
+        request = RequestFactory().get('/metrics/', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(metrics_view(request).status_code, 200)
+
+    @override_settings(PERF_METRICS_TOKEN=None, DEBUG=True)
+    def test_metrics_endpoint_is_closed_without_a_token(self):
+        self.assertEqual(metrics_view(RequestFactory().get('/metrics/')).status_code, 403)
+        request = RequestFactory().get('/metrics/', HTTP_AUTHORIZATION='Bearer None')
+        self.assertEqual(metrics_view(request).status_code, 403)
+
+
+class OpenAPISchemaTests(UsersTestCase):
+    def setUp(self):
+        super().setUp()
+        schema_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(schema_dir.cleanup)
+        self.schema_dir = Path(schema_dir.name)
+        override = override_settings(OPENAPI_SCHEMA_DIR=self.schema_dir, APP_VERSION='test-release')
+        override.enable()
+        self.addCleanup(override.disable)
+        openapi._cache.update(key=None, schemas={})
+
+    def test_warmed_schema_is_served_without_regenerating(self):
+        call_command('generate_schema', stdout=io.StringIO())
+        key = openapi.schema_key()
+        self.assertTrue(openapi.schema_path(key, 'json', compressed=True).exists())
+        openapi._cache.update(key=None, schemas={})
+
+        with patch('MMS.openapi.build_schema') as build_schema:
+            response = self.client.get('/schema/', HTTP_ACCEPT='application/json')
+            yaml_response = self.client.get('/schema/?format=yaml', HTTP_ACCEPT_ENCODING='gzip, br')
+            refused = self.client.get('/schema/?format=yaml', HTTP_ACCEPT_ENCODING='gzip;q=0, *')
+        build_schema.assert_not_called()
+
+        self.assertEqual(response['Content-Type'], 'application/vnd.oai.openapi+json')
+        self.assertEqual(response['ETag'], f'"{key}-json"')
+        schema = json.loads(response.content)
+        self.assertIn('/users/login/', schema['paths'])
+        self.assertIn('jwtAuth', schema['components']['securitySchemes'])
+        self.assertEqual(yaml_response['Content-Encoding'], 'gzip')
+        self.assertTrue(gzip.decompress(yaml_response.content).startswith(b'openapi:'))
+        self.assertNotIn('Content-Encoding', refused)
+        self.assertTrue(refused.content.startswith(b'openapi:'))
+
+        revalidated = self.client.get('/schema/?format=json', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.content, b'')
+
+    def test_key_changes_with_version_and_urlconf(self):
+        key = openapi.schema_key()
+        with self.settings(APP_VERSION='next-release'):
+            self.assertNotEqual(openapi.schema_key(), key)
+        with self.settings(ROOT_URLCONF='users.tests'):
+            self.assertNotEqual(openapi.schema_key(), key)
+        self.assertEqual(openapi.schema_key(), key)
+
+    def test_missing_schema_is_generated_once_on_first_request(self):
+        with patch('MMS.openapi.build_schema', wraps=openapi.build_schema) as build_schema:
+            self.assertEqual(self.client.get('/schema/?format=json').status_code, 200)
+            self.assertEqual(self.client.get('/schema/?format=yaml').status_code, 200)
+        self.assertEqual(build_schema.call_count, 1)
+        self.assertTrue(openapi.schema_path(openapi.schema_key(), 'yaml').exists())
+        self.assertEqual(self.client.get('/schema/swagger-ui/').status_code, 200)
+
+    def test_files_are_not_used_without_a_release(self):
+        with self.settings(APP_VERSION=''):
+            self.assertEqual(self.client.get('/schema/?format=json').status_code, 200)
+            with self.assertRaises(CommandError):
+                call_command('generate_schema', stdout=io.StringIO())
+        self.assertEqual(list(self.schema_dir.iterdir()), [])
+
+    @override_settings(DEBUG=True)
+    def test_files_are_served_in_debug_for_a_named_release(self):
+        call_command('generate_schema', stdout=io.StringIO())
+        openapi._cache.update(key=None, schemas={})
+        with patch('MMS.openapi.build_schema') as build_schema:
+            self.assertEqual(self.client.get('/schema/?format=json').status_code, 200)
+        build_schema.assert_not_called()
+
+    def test_prune_keeps_only_the_current_key(self):
+        (self.schema_dir / 'openapi-oldkey.json').write_bytes(b'{}')
+        call_command('generate_schema', '--prune', stdout=io.StringIO())
+        self.assertEqual(len(list(self.schema_dir.iterdir())), 4)
+        self.assertFalse((self.schema_dir / 'openapi-oldkey.json').exists())
+
+
+class ImportProfileTests(TestCase):
+    def test_import_profile_parses_importtime_output(self):
+        output = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       120 |        120 |     users.utils.rank_cache\n'
+            'import time:       300 |        420 |   users.utils\n'
+        )
+        self.assertEqual(parse_importtime(output), [('users.utils.rank_cache', 2, 120, 120), ('users.utils', 1, 300, 420)])
+
+
+class DatabaseRouterTests(TestCase):
+    @override_settings(DATABASE_REPLICAS=['replica_0', 'replica_1'])
+    def test_reads_go_to_replicas_unless_the_request_writes(self):
+        router = PrimaryReplicaRouter()
+        self.assertIn(router.db_for_read(UserProfile), ['replica_0', 'replica_1'])
+        self.assertEqual(router.db_for_write(UserProfile), 'default')
+
+        routed = {}
+        for method in ['GET', 'POST']:
+            request = RequestFactory().generic(method, '/users/profile/')
+            primary_pinning_middleware(lambda request: routed.setdefault(method, router.db_for_read(UserProfile)))(request)
+        self.assertIn(routed['GET'], ['replica_0', 'replica_1'])
+        self.assertEqual(routed['POST'], 'default')
+        self.assertIn(router.db_for_read(UserProfile), ['replica_0', 'replica_1'])
+
+    def test_cache_fills_and_tasks_read_from_the_primary(self):
+        user = UserProfile.objects.create_user('member@example.com', 'member', 'password')
+        enqueue(WELCOME_MEMBER, {'user_id': user.pk})
+        cache.clear()
+        rank_cache.invalidate()
+        # replica_0 is not a configured database, so any read routed to it fails
+        with self.settings(DATABASE_REPLICAS=['replica_0']):
+            self.assertEqual(get_token_version(user.pk), user.token_version)
+            self.assertEqual(rank_cache.get_ranks(), {})
+            self.assertEqual(cached_payload('tests:count', [MEMBERS_NAMESPACE], UserProfile.objects.count), 1)
+            self.assertEqual(task_queue.run_pending(), [Task.DONE])
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_without_replicas_everything_uses_default(self):
+        self.assertEqual(PrimaryReplicaRouter().db_for_read(UserProfile), 'default')
@@ -1,16 +1,24 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from users.views.user_view import UserViewSet, UserLoginView
+from users.views.user_view import UserViewSet, UserLoginView, MemberTokenRefreshView
+from users.views.async_user_view import AsyncUserViewSet, AsyncUserLoginView
+from users.views.rank_view import RankView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+# ASGI deployments serve the async views natively; under WSGI the sync ones avoid an event loop per request.
+if settings.ASYNC_USER_VIEWS:
+    UserViewSet, UserLoginView = AsyncUserViewSet, AsyncUserLoginView
+
 router = DefaultRouter()
-router.register('users', UserViewSet)
+router.register('users', UserViewSet, basename='users')
 
 #app_name = 'users'
 
 urlpatterns = [
     path('', include(router.urls)),
     path('users/login/', UserLoginView.as_view(), name='login_user'),
+    path('ranks/', RankView.as_view(), name='ranks'),
     #path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
-    #path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
-]
\ No newline at end of file
+    path('users/token/refresh/', MemberTokenRefreshView.as_view(), name='token_refresh'),
+]
@@ -0,0 +1,40 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.utils.decorators import classonlymethod
+
+
+# Native async dispatch for DRF views. Coroutine handlers are awaited on the event loop.
+# Synchronous handlers and DRF's request setup (authentication, permissions, throttling)
+# run through sync_to_async, because they may touch the ORM. These mixins use comments
+# rather than docstrings because drf_spectacular publishes inherited view docstrings.
+class AsyncDispatchMixin:
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            if iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+class AsyncViewSetMixin(AsyncDispatchMixin):
+    @classonlymethod
+    def as_view(cls, actions=None, **initkwargs):
+        # ViewSetMixin builds a plain function around dispatch(); flag it so Django awaits it.
+        return markcoroutinefunction(super().as_view(actions, **initkwargs))
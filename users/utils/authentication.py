@@ -0,0 +1,66 @@
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from users.models import UserProfile
+from users.utils.tokens import get_token_version
+
+
+class TokenUserProfile:
+    """
+    Request user built from access token claims. The role comes from the token, which is
+    revoked when it changes; any other attribute, approval state included (approving does not
+    revoke tokens), loads the UserProfile row on first access.
+    """
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+
+    def __init__(self, token):
+        self._user = None
+        self.id = self.pk = int(token[api_settings.USER_ID_CLAIM])
+        self.role = token['role']
+        self.token_version = token['ver']
+
+    def resolve(self):
+        if self._user is None:
+            self._user = UserProfile.objects.get(pk=self.pk)
+        return self._user
+
+    async def aresolve(self):
+        if self._user is None:
+            self._user = await UserProfile.objects.aget(pk=self.pk)
+        return self._user
+
+    def __getattr__(self, name):
+        return getattr(self.resolve(), name)
+
+    def __eq__(self, other):
+        return isinstance(other, (TokenUserProfile, UserProfile)) and other.pk == self.pk
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    def __str__(self):
+        return str(self.resolve())
+
+
+def resolve_user(user):
+    return user.resolve() if isinstance(user, TokenUserProfile) else user
+
+
+async def aresolve_user(user):
+    return await user.aresolve() if isinstance(user, TokenUserProfile) else user
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """JWT authentication that trusts the token claims instead of loading the user per request"""
+
+    def get_user(self, validated_token):
+        if 'ver' not in validated_token:
+            # Tokens minted before the claims were added still take the database path.
+            return super().get_user(validated_token)
+
+        if get_token_version(validated_token[api_settings.USER_ID_CLAIM]) != validated_token['ver']:
+            raise InvalidToken('Token has been revoked')
+        return TokenUserProfile(validated_token)
@@ -1,5 +1,5 @@
 from rest_framework import status
-from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.exceptions import PermissionDenied, Throttled, ValidationError
 from rest_framework.views import exception_handler as drf_exception_handler
 from rest_framework_simplejwt.exceptions import InvalidToken
 
@@ -19,6 +19,13 @@ def custom_exception_handler(exc, context):
             "status": status.HTTP_403_FORBIDDEN,
             "data": None
         }
+    elif isinstance(exc, Throttled):
+        # DRF has already set the Retry-After header from exc.wait
+        response.data = {
+            "message": "Too many requests, please try again later",
+            "status": status.HTTP_429_TOO_MANY_REQUESTS,
+            "data": {"retry_after": exc.wait}
+        }
     elif isinstance(exc, ValidationError):
         # Handle validation errors
         response.data = {
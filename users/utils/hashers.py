@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher, ScryptPasswordHasher
+
+# Cost parameters are read from settings.PASSWORD_HASHER_PARAMS at call time. Hashers keep
+# their stock algorithm names, so existing hashes verify and must_update() triggers the
+# rehash-on-login upgrade whenever the configured cost changes.
+
+
+def _param(algorithm, name, default):
+    return getattr(settings, 'PASSWORD_HASHER_PARAMS', {}).get(algorithm, {}).get(name, default)
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return _param('pbkdf2', 'iterations', PBKDF2PasswordHasher.iterations)
+
+
+class TunableArgon2PasswordHasher(Argon2PasswordHasher):
+    @property
+    def time_cost(self):
+        return _param('argon2', 'time_cost', Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return _param('argon2', 'memory_cost', Argon2PasswordHasher.memory_cost)
+
+    @property
+    def parallelism(self):
+        return _param('argon2', 'parallelism', Argon2PasswordHasher.parallelism)
+
+
+class TunableScryptPasswordHasher(ScryptPasswordHasher):
+    @property
+    def work_factor(self):
+        return _param('scrypt', 'work_factor', ScryptPasswordHasher.work_factor)
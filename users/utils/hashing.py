@@ -0,0 +1,62 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, verify_password
+
+# Below this many passwords the cost of starting worker processes outweighs the gain.
+PARALLEL_HASH_THRESHOLD = 64
+
+_thread_pool = None
+_thread_pool_lock = threading.Lock()
+
+
+def _init_hash_worker():
+    import django
+    django.setup()
+
+
+def hash_passwords(passwords, workers=None):
+    """Hash a batch of raw passwords, spreading the work across a process pool"""
+    passwords = list(passwords)
+    workers = workers or getattr(settings, 'PASSWORD_HASH_WORKERS', None) or os.cpu_count() or 1
+    if workers == 1 or len(passwords) < PARALLEL_HASH_THRESHOLD:
+        return [make_password(password) for password in passwords]
+
+    # multiprocessing is only needed for bulk imports, so it isn't imported at start-up
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_hash_worker) as pool:
+        chunksize = max(1, len(passwords) // (workers * 4))
+        return list(pool.map(make_password, passwords, chunksize=chunksize))
+
+
+def get_hash_executor():
+    """
+    Bounded thread pool for hashing on behalf of async views. hashlib and argon2 release
+    the GIL while hashing, so these threads run in parallel without blocking the event loop.
+    """
+    global _thread_pool
+    with _thread_pool_lock:
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'PASSWORD_HASH_THREADS', 4), thread_name_prefix='password-hash'
+            )
+    return _thread_pool
+
+
+async def amake_password(password):
+    return await asyncio.get_running_loop().run_in_executor(get_hash_executor(), make_password, password)
+
+
+async def acheck_user_password(user, raw_password):
+    """Async counterpart of AbstractBaseUser.check_password, including the rehash-on-login upgrade"""
+    is_correct, must_update = await asyncio.get_running_loop().run_in_executor(
+        get_hash_executor(), verify_password, raw_password, user.password
+    )
+    if is_correct and must_update:
+        user.password = await amake_password(raw_password)
+        await user.asave(update_fields=['password'])
+    return is_correct
@@ -0,0 +1,117 @@
+import csv
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+
+from users.serializers.member_list_serializer import member_rows, serialize_members
+from users.utils.rank_cache import get_ranks
+from users.utils.renderers import dumps
+
+EXPORT_CHUNK_SIZE = 2000
+CSV_COLUMNS = ['id', 'email', 'username', 'role', 'phone', 'full_name', 'rank_id', 'rank_name', 'is_approved']
+
+
+class _Echo:
+    """File-like object handing csv.writer output straight back to the caller"""
+
+    def write(self, value):
+        return value
+
+
+def iter_member_batches(members, chunk_size=EXPORT_CHUNK_SIZE):
+    # Rows are pulled from a server-side cursor and serialized a batch at a time,
+    # so memory use is bounded by chunk_size instead of the roster size.
+    batch = []
+    for member in member_rows(members.order_by('id')).iterator(chunk_size=chunk_size):
+        batch.append(member)
+        if len(batch) == chunk_size:
+            yield serialize_members(batch)
+            batch = []
+    if batch:
+        yield serialize_members(batch)
+
+
+async def aiter_member_batches(members, chunk_size=EXPORT_CHUNK_SIZE):
+    ranks = await sync_to_async(get_ranks)()
+    batch = []
+    async for member in member_rows(members.order_by('id')).aiterator(chunk_size=chunk_size):
+        batch.append(member)
+        if len(batch) == chunk_size:
+            yield serialize_members(batch, ranks)
+            batch = []
+    if batch:
+        yield serialize_members(batch, ranks)
+
+
+def _json_format(message, status_code):
+    # Same message/status/data envelope as custom_response, emitted incrementally.
+    head = dumps({'message': message, 'status': status_code})[:-1] + b',"data":['
+
+    def encode(rows, first):
+        return (b'' if first else b',') + b','.join(dumps(row) for row in rows)
+
+    return 'application/json', head, encode, b']}'
+
+
+def _ndjson_format(message, status_code):
+    head = dumps({'message': message, 'status': status_code}) + b'\n'
+
+    def encode(rows, first):
+        return b''.join(dumps(row) + b'\n' for row in rows)
+
+    return 'application/x-ndjson', head, encode, b''
+
+
+def _csv_format(message, status_code):
+    writer = csv.writer(_Echo())
+
+    def encode(rows, first):
+        return ''.join(
+            writer.writerow([
+                row['id'], row['email'], row['username'], row['role'], row['phone'], row['full_name'],
+                row['rank']['id'] if row['rank'] else '', row['rank']['name'] if row['rank'] else '',
+                row['is_approved'],
+            ])
+            for row in rows
+        )
+
+    return 'text/csv', writer.writerow(CSV_COLUMNS), encode, ''
+
+
+EXPORT_FORMATS = {'json': _json_format, 'ndjson': _ndjson_format, 'csv': _csv_format}
+
+
+def _stream(batches, head, encode, tail):
+    yield head
+    for index, rows in enumerate(batches):
+        yield encode(rows, index == 0)
+    yield tail
+
+
+async def _astream(batches, head, encode, tail):
+    yield head
+    index = 0
+    async for rows in batches:
+        yield encode(rows, index == 0)
+        index += 1
+    yield tail
+
+
+def _export_response(stream, content_type, export_format, status_code):
+    response = StreamingHttpResponse(stream, content_type=content_type, status=status_code)
+    if export_format == 'csv':
+        response['Content-Disposition'] = 'attachment; filename="members.csv"'
+    return response
+
+
+def streaming_export_response(members, export_format, message, status_code):
+    content_type, head, encode, tail = EXPORT_FORMATS[export_format](message, status_code)
+    stream = _stream(iter_member_batches(members), head, encode, tail)
+    return _export_response(stream, content_type, export_format, status_code)
+
+
+def astreaming_export_response(members, export_format, message, status_code):
+    """Async iterator variant for ASGI, where the rows are fetched with async iteration"""
+    content_type, head, encode, tail = EXPORT_FORMATS[export_format](message, status_code)
+    stream = _astream(aiter_member_batches(members), head, encode, tail)
+    return _export_response(stream, content_type, export_format, status_code)
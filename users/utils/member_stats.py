@@ -0,0 +1,159 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Value, When
+
+from users.models import UserProfile
+from users.models.member_stat_model import MemberStat
+from users.utils.rank_cache import get_ranks
+
+APPROVED = 'approved'
+PENDING = 'pending'
+NO_RANK = 'none'
+
+
+def member_buckets(role, rank_id, is_approved):
+    return [
+        (MemberStat.ROLE, role),
+        (MemberStat.RANK, NO_RANK if rank_id is None else str(rank_id)),
+        (MemberStat.APPROVAL, APPROVED if is_approved else PENDING),
+    ]
+
+
+def _bucket_filter(buckets):
+    match = Q()
+    for dimension, key in buckets:
+        match |= Q(dimension=dimension, key=key)
+    return MemberStat.objects.filter(match)
+
+
+def _add(deltas):
+    return _bucket_filter(deltas).update(count=F('count') + Case(
+        *[When(dimension=dimension, key=key, then=Value(delta)) for (dimension, key), delta in deltas.items()],
+        output_field=IntegerField(),
+    ))
+
+
+def apply_deltas(deltas):
+    """Add each delta to its (dimension, key) bucket in a single UPDATE"""
+    deltas = {bucket: delta for bucket, delta in deltas.items() if delta}
+    if not deltas or _add(deltas) == len(deltas):
+        return
+    # Buckets are seeded for every role, approval state and rank, so this only runs
+    # after a rebuild or a race; rare enough for the extra queries.
+    existing = set(_bucket_filter(deltas).values_list('dimension', 'key'))
+    missing = {bucket: delta for bucket, delta in deltas.items() if bucket not in existing}
+    MemberStat.objects.bulk_create([MemberStat(dimension=dimension, key=key) for dimension, key in missing],
+                                   ignore_conflicts=True)
+    _add(missing)
+
+
+def seed_buckets(*buckets):
+    MemberStat.objects.bulk_create([MemberStat(dimension=dimension, key=key) for dimension, key in buckets],
+                                   ignore_conflicts=True)
+
+
+def record_members(members, sign=1):
+    """Count (role, rank_id, is_approved) tuples in, or out with sign=-1"""
+    deltas = Counter()
+    for member in members:
+        for bucket in member_buckets(*member):
+            deltas[bucket] += sign
+    apply_deltas(deltas)
+
+
+def move_member(old, new):
+    deltas = Counter()
+    for bucket in member_buckets(*old):
+        deltas[bucket] -= 1
+    for bucket in member_buckets(*new):
+        deltas[bucket] += 1
+    apply_deltas(deltas)
+
+
+def record_approvals(count):
+    apply_deltas({(MemberStat.APPROVAL, PENDING): -count, (MemberStat.APPROVAL, APPROVED): count})
+
+
+def record_role_change(previous, role):
+    deltas = Counter({(MemberStat.ROLE, role): sum(previous.values())})
+    for old_role, count in previous.items():
+        deltas[(MemberStat.ROLE, old_role)] -= count
+    apply_deltas(deltas)
+
+
+def forget_rank(rank_id):
+    # Deleting a rank nulls its members' rank_id in SQL, without per-member signals.
+    stat = MemberStat.objects.filter(dimension=MemberStat.RANK, key=str(rank_id)).first()
+    if stat is not None:
+        apply_deltas({(MemberStat.RANK, NO_RANK): stat.count})
+        stat.delete()
+
+
+def count_members():
+    """Bucket counts computed from scratch with one GROUP BY over the members table"""
+    counts = Counter({bucket: 0 for bucket in empty_buckets()})
+    grouped = UserProfile.objects.order_by().values_list('role', 'rank_id', 'is_approved').annotate(total=Count('id'))
+    for role, rank_id, is_approved, total in grouped:
+        for bucket in member_buckets(role, rank_id, is_approved):
+            counts[bucket] += total
+    return counts
+
+
+def empty_buckets():
+    return [
+        *[(MemberStat.ROLE, role) for role, _ in UserProfile.ROLE_CHOICES],
+        *[(MemberStat.RANK, str(rank_id)) for rank_id in get_ranks()],
+        (MemberStat.RANK, NO_RANK),
+        (MemberStat.APPROVAL, APPROVED),
+        (MemberStat.APPROVAL, PENDING),
+    ]
+
+
+def stored_counts():
+    return {(dimension, key): count for dimension, key, count in MemberStat.objects.values_list('dimension', 'key', 'count')}
+
+
+def member_total(counts):
+    return sum(count for (dimension, _), count in counts.items() if dimension == MemberStat.APPROVAL)
+
+
+def find_drift():
+    """Return {bucket: (stored, actual)} for every bucket whose stored count is wrong"""
+    stored, actual = stored_counts(), count_members()
+    return {
+        bucket: (stored.get(bucket, 0), actual.get(bucket, 0))
+        for bucket in sorted(stored.keys() | actual.keys())
+        if stored.get(bucket, 0) != actual.get(bucket, 0)
+    }
+
+
+def rebuild():
+    with transaction.atomic():
+        counts = count_members()
+        MemberStat.objects.all().delete()
+        MemberStat.objects.bulk_create([MemberStat(dimension=dimension, key=key, count=count)
+                                        for (dimension, key), count in counts.items()])
+    return counts
+
+
+def get_stats():
+    """Dashboard counts from the summary table: one query plus the rank cache"""
+    ranks = get_ranks()
+    stats = {
+        'total': 0,
+        'approved': 0,
+        'pending_approvals': 0,
+        'by_role': {role: 0 for role, _ in UserProfile.ROLE_CHOICES},
+        'by_rank': [],
+    }
+    for dimension, key, count in MemberStat.objects.order_by('dimension', 'key').values_list('dimension', 'key', 'count'):
+        if dimension == MemberStat.APPROVAL:
+            stats['total'] += count
+            stats['approved' if key == APPROVED else 'pending_approvals'] = count
+        elif dimension == MemberStat.ROLE:
+            stats['by_role'][key] = count
+        elif count:
+            stats['by_rank'].append({'rank': None if key == NO_RANK else ranks.get(int(key)), 'count': count})
+    stats['by_rank'].sort(key=lambda row: (row['rank'] is None, row['rank'] and row['rank']['id']))
+    return stats
@@ -0,0 +1,49 @@
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination
+
+
+class MemberCursorPagination(CursorPagination):
+    """
+    Keyset pagination on the validated `ordering` field (the primary key by default), so
+    every page is a bounded index range scan
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = 'id'
+    ordering_param = 'ordering'
+    # Only unique, indexed columns: the cursor holds a single position value, so a
+    # non-unique or nullable sort key would make pages skip or repeat rows.
+    ordering_fields = ['id', 'username', 'email']
+
+    @classmethod
+    def ordering_choices(cls):
+        return [prefix + field for field in cls.ordering_fields for prefix in ['', '-']]
+
+    def get_ordering(self, request, queryset, view):
+        ordering = request.query_params.get(self.ordering_param)
+        if ordering in self.ordering_choices():
+            return (ordering,)
+        return (self.ordering,)
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+
+
+class EstimatedCountPaginator(Paginator):
+    """Page-number paginator that trusts a precomputed count instead of running COUNT(*)"""
+
+    def __init__(self, *args, count=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._estimated_count = count
+
+    @cached_property
+    def count(self):
+        if self._estimated_count is not None:
+            return self._estimated_count
+        return super().count
@@ -0,0 +1,66 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from users.models.user_rank_model import UserRank
+
+VERSION_KEY = 'users:ranks:version'
+
+# Local-memory tier in front of the shared cache; it only re-checks the shared version
+# every RANK_CACHE_LOCAL_TTL seconds, so the steady state costs no I/O at all.
+_local = {'version': None, 'ranks': None, 'checked_at': 0.0}
+
+
+def _ranks_key(version):
+    return f'users:ranks:{version}'
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seed from the clock so an evicted or expired version key never resurrects an older snapshot.
+        cache.add(VERSION_KEY, int(time.time() * 1000), timeout=settings.RANK_CACHE_TIMEOUT)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+async def aget_version():
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, int(time.time() * 1000), timeout=settings.RANK_CACHE_TIMEOUT)
+        version = await cache.aget(VERSION_KEY)
+    return version
+
+
+def get_ranks():
+    """Return every rank as {id: {'id': id, 'name': name}}"""
+    now = time.monotonic()
+    if _local['ranks'] is not None and now - _local['checked_at'] < getattr(settings, 'RANK_CACHE_LOCAL_TTL', 5):
+        return _local['ranks']
+
+    version = get_version()
+    if _local['ranks'] is None or _local['version'] != version:
+        ranks = cache.get(_ranks_key(version))
+        if ranks is None:
+            ranks = {
+                rank_id: {'id': rank_id, 'name': name}
+                # From the primary, so a lagging replica's ranks are not cached under the new version
+                for rank_id, name in UserRank.objects.using('default').order_by('id').values_list('id', 'name')
+            }
+            cache.set(_ranks_key(version), ranks, timeout=settings.RANK_CACHE_TIMEOUT)
+        _local.update(version=version, ranks=ranks)
+    _local['checked_at'] = now
+    return _local['ranks']
+
+
+def get_rank(rank_id):
+    return get_ranks().get(rank_id)
+
+
+def invalidate():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        get_version()
+    _local['ranks'] = None
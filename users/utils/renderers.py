@@ -0,0 +1,52 @@
+import json
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from MMS.metrics import timed
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# DRF's encoder still handles the types orjson leaves to `default` (Decimal, lazy strings, ...).
+_fallback = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def dumps(data):
+    """Encode data straight to bytes, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(data, default=_fallback.default, option=orjson.OPT_NON_STR_KEYS)
+    return _fallback.encode(data).encode()
+
+
+def loads(content):
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+class EnvelopeJSONRenderer(BaseRenderer):
+    """Renders the message/status/data envelope in one pass, without DRF's str round trip"""
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        with timed('render'):
+            return dumps(data)
+
+
+class EnvelopeJSONParser(BaseParser):
+    media_type = 'application/json'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return loads(stream.read())
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
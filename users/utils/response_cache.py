@@ -0,0 +1,124 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from MMS.db_router import read_from_primary
+from users.utils import rank_cache
+from users.utils.custom_response import custom_response
+
+MEMBERS_NAMESPACE = 'members'
+
+
+def profile_namespace(user_id):
+    return f'profile:{user_id}'
+
+
+def _version_key(namespace):
+    return f'users:version:{namespace}'
+
+
+def get_versions(*namespaces):
+    keys = [_version_key(namespace) for namespace in namespaces]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, timeout=settings.RESPONSE_CACHE_VERSION_TIMEOUT)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+async def aget_versions(*namespaces):
+    keys = [_version_key(namespace) for namespace in namespaces]
+    versions = await cache.aget_many(keys)
+    for key in keys:
+        if key not in versions:
+            await cache.aadd(key, uuid.uuid4().hex, timeout=settings.RESPONSE_CACHE_VERSION_TIMEOUT)
+            versions[key] = await cache.aget(key)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(*namespaces):
+    # Versions are random tokens rather than counters, so many of them can be replaced
+    # in a single set_many round trip.
+    cache.set_many({_version_key(namespace): uuid.uuid4().hex for namespace in namespaces},
+                    timeout=settings.RESPONSE_CACHE_VERSION_TIMEOUT)
+
+
+def _etag(key, versions):
+    return '"%s"' % hashlib.sha1(':'.join([key, *map(str, versions)]).encode()).hexdigest()
+
+
+def _respond(request, etag, data, message):
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache', 'Vary': 'Authorization'}
+    if data is None:
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response = custom_response(message, status.HTTP_200_OK, data=data)
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+def _is_fresh(request, etag):
+    return etag in parse_etags(request.headers.get('If-None-Match', ''))
+
+
+def _current_etag(key, namespaces):
+    return _etag(key, get_versions(*namespaces) + [rank_cache.get_version()])
+
+
+async def _acurrent_etag(key, namespaces):
+    return _etag(key, await aget_versions(*namespaces) + [await rank_cache.aget_version()])
+
+
+def _cached_build(etag, build):
+    payload_key = f'users:response:{etag}'
+    data = cache.get(payload_key)
+    if data is None:
+        with read_from_primary():
+            data = build()
+        cache.set(payload_key, data, settings.RESPONSE_CACHE_TIMEOUT)
+    return data
+
+
+async def _acached_build(etag, abuild):
+    payload_key = f'users:response:{etag}'
+    data = await cache.aget(payload_key)
+    if data is None:
+        with read_from_primary():
+            data = await abuild()
+        await cache.aset(payload_key, data, settings.RESPONSE_CACHE_TIMEOUT)
+    return data
+
+
+def cached_payload(key, namespaces, build):
+    """build() output through the same cache entry cached_response() serves for key"""
+    return _cached_build(_current_etag(key, namespaces), build)
+
+
+async def acached_payload(key, namespaces, abuild):
+    return await _acached_build(await _acurrent_etag(key, namespaces), abuild)
+
+
+def cached_response(request, key, namespaces, build, message):
+    """
+    Serve build() output from a cache entry keyed by the current versions of namespaces.
+    The strong ETag is derived from those versions alone, so a matching If-None-Match is
+    answered with 304 before any payload is loaded or serialized.
+    """
+    etag = _current_etag(key, namespaces)
+    if _is_fresh(request, etag):
+        return _respond(request, etag, None, message)
+    return _respond(request, etag, _cached_build(etag, build), message)
+
+
+async def acached_response(request, key, namespaces, abuild, message):
+    """cached_response() for async views; abuild is a coroutine function"""
+    etag = await _acurrent_etag(key, namespaces)
+    if _is_fresh(request, etag):
+        return _respond(request, etag, None, message)
+    return _respond(request, etag, await _acached_build(etag, abuild), message)
@@ -0,0 +1,119 @@
+import os
+import random
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from MMS.db_router import read_from_primary
+from users.models.task_model import Task
+
+# name -> handler, filled in by the @task decorator (see users/tasks.py)
+registry = {}
+
+
+def task(name):
+    def register(func):
+        registry[name] = func
+        return func
+    return register
+
+
+def _new_task(name, payload, key, delay):
+    return Task(
+        name=name,
+        payload=payload or {},
+        idempotency_key=key,
+        max_attempts=settings.TASK_MAX_ATTEMPTS,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def enqueue(name, payload=None, key=None, delay=0):
+    """Queue name(**payload) for the workers with a single INSERT; a repeated key is ignored"""
+    enqueue_many([(name, payload, key)], delay=delay)
+
+
+def enqueue_many(tasks, delay=0):
+    """Queue (name, payload, key) tuples with one INSERT"""
+    Task.objects.bulk_create([_new_task(name, payload, key, delay) for name, payload, key in tasks],
+                             ignore_conflicts=True)
+
+
+async def aenqueue(name, payload=None, key=None, delay=0):
+    await Task.objects.abulk_create([_new_task(name, payload, key, delay)], ignore_conflicts=True)
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def retry_delay(attempts):
+    """Exponential backoff with full jitter, capped at TASK_RETRY_MAX_DELAY"""
+    ceiling = min(settings.TASK_RETRY_BASE_DELAY * 2 ** (attempts - 1), settings.TASK_RETRY_MAX_DELAY)
+    return random.uniform(ceiling / 2, ceiling)
+
+
+def claim_tasks(worker, limit):
+    """
+    Lease up to limit due tasks to worker. Running tasks whose lease ran out (their worker
+    died) are due again. SKIP LOCKED lets concurrent workers claim disjoint batches on
+    PostgreSQL; SQLite serializes the claiming transactions instead.
+    """
+    now = timezone.now()
+    due = Q(status=Task.PENDING, run_at__lte=now) | Q(
+        status=Task.RUNNING, locked_at__lt=now - timedelta(seconds=settings.TASK_LEASE_SECONDS)
+    )
+    with transaction.atomic():
+        ids = list(Task.objects.select_for_update(skip_locked=True).filter(due)
+                   .order_by('run_at').values_list('id', flat=True)[:limit])
+        Task.objects.filter(due, id__in=ids).update(
+            status=Task.RUNNING, locked_by=worker, locked_at=now, attempts=F('attempts') + 1,
+        )
+    # A replica may not have the claim yet; missing rows would sit leased until the lease ran out
+    return list(Task.objects.using('default').filter(id__in=ids, status=Task.RUNNING, locked_by=worker, locked_at=now))
+
+
+def run_task(claimed):
+    """
+    Run one claimed task and record the outcome. Every write is conditional on the lease still
+    being ours, so a worker that overran TASK_LEASE_SECONDS cannot overwrite the state of the
+    run that reclaimed it; that case returns None.
+    """
+    handler = registry.get(claimed.name)
+    lease = Task.objects.filter(pk=claimed.pk, locked_by=claimed.locked_by, locked_at=claimed.locked_at)
+    try:
+        if handler is None:
+            raise LookupError(f'No task registered as {claimed.name!r}')
+        # Tasks act on writes made moments ago and refill the caches those writes invalidated
+        with read_from_primary():
+            handler(**claimed.payload)
+    except Exception:
+        error = traceback.format_exc()
+        if claimed.attempts >= claimed.max_attempts:
+            outcome = Task.FAILED
+            updated = lease.update(status=Task.FAILED, last_error=error, finished_at=timezone.now())
+        else:
+            outcome = Task.PENDING
+            updated = lease.update(
+                status=Task.PENDING, last_error=error, locked_by='', locked_at=None,
+                run_at=timezone.now() + timedelta(seconds=retry_delay(claimed.attempts)),
+            )
+    else:
+        outcome = Task.DONE
+        updated = lease.update(status=Task.DONE, finished_at=timezone.now())
+    return outcome if updated else None
+
+
+def run_pending(worker=None, limit=10):
+    """Claim and run one batch; returns the outcome of each task run (None for a lost lease)"""
+    worker = worker or worker_name()
+    return [run_task(claimed) for claimed in claim_tasks(worker, limit)]
+
+
+def purge_finished(older_than):
+    return Task.objects.filter(status=Task.DONE, finished_at__lt=timezone.now() - older_than).delete()[0]
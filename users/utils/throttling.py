@@ -0,0 +1,94 @@
+import hashlib
+import math
+import time
+from collections.abc import Mapping
+
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from users.models import UserProfile
+
+DURATIONS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """'10/min' -> (10, 60), in the same format as DRF's DEFAULT_THROTTLE_RATES"""
+    if not rate:
+        return None
+    num, period = rate.split('/')
+    return int(num), DURATIONS[period[0]]
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    Sliding-window counter: the current fixed window's count plus the previous window's,
+    weighted by how much of it still overlaps the sliding window. Two integers per client
+    instead of DRF's list of timestamps, read in one round trip and bumped with an atomic
+    incr, so turning a request away costs a single cache read.
+
+    Clients are named by get_ident_key, the address by default; the rate is looked up under
+    '<view.throttle_scope>_<suffix>', and a scope without a rate is not throttled.
+    """
+    suffix = None
+
+    def get_ident_key(self, request):
+        # X-Forwarded-For is only trusted with REST_FRAMEWORK['NUM_PROXIES'] set
+        return self.get_ident(request)
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        scope = f'{getattr(view, "throttle_scope", None)}_{self.suffix}'
+        rate = parse_rate(api_settings.DEFAULT_THROTTLE_RATES.get(scope))
+        ident = self.get_ident_key(request)
+        if rate is None or ident is None:
+            return True
+
+        num_requests, duration = rate
+        now = time.time()
+        window, elapsed = divmod(now, duration)
+        current_key, previous_key = (f'throttle:{scope}:{ident}:{int(w)}' for w in (window, window - 1))
+        cache = caches['throttle']
+        counts = cache.get_many([current_key, previous_key])
+        current, previous = counts.get(current_key, 0), counts.get(previous_key, 0)
+
+        if previous * (1 - elapsed / duration) + current >= num_requests:
+            self.wait_seconds = self.retry_after(num_requests, duration, elapsed, current, previous)
+            return False
+
+        if not cache.add(current_key, 1, timeout=2 * duration):
+            try:
+                cache.incr(current_key)
+            except ValueError:
+                # Expired between add() and incr()
+                cache.set(current_key, 1, timeout=2 * duration)
+        return True
+
+    @staticmethod
+    def retry_after(num_requests, duration, elapsed, current, previous):
+        if current < num_requests:
+            # Wait for enough of the previous window to slide out
+            return max(duration * (1 - (num_requests - current) / previous) - elapsed, 1)
+        # The current window is full by itself; next window it becomes the weighted one
+        return duration - elapsed + duration * (1 - (num_requests - 1) / current)
+
+    def wait(self):
+        return None if self.wait_seconds is None else math.ceil(self.wait_seconds)
+
+
+class IPThrottle(SlidingWindowThrottle):
+    suffix = 'ip'
+
+
+class UsernameThrottle(SlidingWindowThrottle):
+    """Limits attempts against one account, however many addresses they come from"""
+    suffix = 'username'
+
+    def get_ident_key(self, request):
+        if not isinstance(request.data, Mapping):
+            return None
+        username = request.data.get(UserProfile.USERNAME_FIELD)
+        if not isinstance(username, str) or not username:
+            return None
+        # Hashed, so arbitrary submitted usernames make fixed-size, safe cache keys
+        return hashlib.sha256(username.lower().encode()).hexdigest()[:32]
@@ -0,0 +1,72 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from users.models import UserProfile
+from users.models.revoked_token_model import RevokedToken
+
+# Sentinel for users that no longer exist or were deactivated; it never matches a token.
+REVOKED_VERSION = -1
+
+
+class MemberRefreshToken(RefreshToken):
+    """Refresh token whose access tokens carry the claims permission checks need"""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token['role'] = user.role
+        token['ver'] = user.token_version
+        return token
+
+
+def _token_version_key(user_id):
+    return f'users:token_version:{user_id}'
+
+
+def get_token_version(user_id):
+    key = _token_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # From the primary: a replica may not have seen the role change or deactivation yet
+        version = (
+            UserProfile.objects.using('default').filter(pk=user_id, is_active=True)
+            .values_list('token_version', flat=True).first()
+        )
+        version = REVOKED_VERSION if version is None else version
+        cache.set(key, version, settings.TOKEN_VERSION_CACHE_TIMEOUT)
+    return version
+
+
+def forget_token_versions(*user_ids):
+    cache.delete_many([_token_version_key(user_id) for user_id in user_ids])
+
+
+def _revoked_key(jti):
+    return f'users:revoked:{jti}'
+
+
+def revoke_refresh_token(token):
+    """
+    Use up a refresh token, returning False if it already was. The unique jti index makes the
+    INSERT the authoritative check, so a token is accepted at most once even under concurrent
+    refreshes; the cache only turns replays away without touching the database.
+    """
+    jti = token[api_settings.JTI_CLAIM]
+    if cache.get(_revoked_key(jti)):
+        return False
+    try:
+        with transaction.atomic():
+            RevokedToken.objects.create(jti=jti, user_id=token[api_settings.USER_ID_CLAIM],
+                                        expires_at=datetime_from_epoch(token['exp']))
+        revoked = True
+    except IntegrityError:
+        revoked = False
+    # Entries expire with the token itself; past that the signature check rejects it anyway.
+    cache.set(_revoked_key(jti), True, timeout=max(int(token['exp'] - time.time()), 1))
+    return revoked
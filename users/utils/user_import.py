@@ -0,0 +1,131 @@
+import csv
+import io
+import json
+
+from django.db import IntegrityError, transaction
+
+from users.models import UserProfile
+from users.serializers.import_serializer import UserImportRowSerializer
+from users.serializers.profile_serializer import duplicate_user_error
+from users.utils.hashing import hash_passwords
+from users.utils.member_stats import record_members
+from users.utils.rank_cache import get_ranks
+from users.utils.response_cache import bump_versions, MEMBERS_NAMESPACE
+
+IMPORT_BATCH_SIZE = 1000
+# Keeps IN (...) lookups under SQLite's bound-parameter limit.
+LOOKUP_CHUNK_SIZE = 900
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def parse_upload(content, filename=''):
+    if isinstance(content, bytes):
+        try:
+            content = content.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise ImportFormatError('Uploads must be UTF-8 encoded')
+    if filename.lower().endswith('.csv') or not content.lstrip().startswith(('[', '{')):
+        return [{key: value for key, value in row.items() if value != ''} for row in csv.DictReader(io.StringIO(content))]
+
+    try:
+        rows = json.loads(content)
+    except ValueError as exc:
+        raise ImportFormatError(f'Invalid JSON: {exc}')
+    if isinstance(rows, dict):
+        rows = rows.get('users')
+    if not isinstance(rows, list):
+        raise ImportFormatError('Expected a list of users')
+    return rows
+
+
+def _chunks(values, size=LOOKUP_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _existing(field, values):
+    existing = set()
+    for chunk in _chunks(values):
+        # The primary: a replica may not have the members a concurrent import just added
+        existing.update(UserProfile.objects.using('default').filter(**{f'{field}__in': chunk})
+                        .values_list(field, flat=True))
+    return existing
+
+
+def _reject_taken(valid, errors):
+    """Move rows whose email or username is already registered from valid to errors"""
+    taken = {field: _existing(field, {data[field] for data in valid.values()}) for field in ['email', 'username']}
+    rejected = []
+    for index, data in list(valid.items()):
+        for field in ['email', 'username']:
+            if data[field] in taken[field]:
+                errors.setdefault(index, {})[field] = [f'user profile with this {field} already exists.']
+        if index in errors:
+            rejected.append(valid.pop(index))
+    return rejected
+
+
+def _insert(users, batch_size):
+    with transaction.atomic():
+        for batch in _chunks(users, batch_size):
+            UserProfile.objects.bulk_create(batch)
+        # bulk_create sends no post_save, so count the new members in one go
+        record_members([(user.role, user.rank_id, user.is_approved) for user in users])
+
+
+def import_users(rows, batch_size=IMPORT_BATCH_SIZE, workers=None, dry_run=False):
+    """
+    Validate every row up front, then hash passwords in parallel and insert the valid rows
+    with bulk_create. Returns the number of created users and the per-row errors.
+    """
+    errors = {}
+    valid = {}
+    for index, row in enumerate(rows):
+        serializer = UserImportRowSerializer(data=row if isinstance(row, dict) else {})
+        if serializer.is_valid():
+            data = serializer.validated_data
+            data['email'] = UserProfile.objects.normalize_email(data['email'])
+            valid[index] = data
+        else:
+            errors[index] = serializer.errors
+
+    seen = {'email': set(), 'username': set()}
+    for index, data in list(valid.items()):
+        for field, values in seen.items():
+            if data[field] in values:
+                errors.setdefault(index, {})[field] = [f'Duplicate {field} in upload']
+                valid.pop(index, None)
+            values.add(data[field])
+
+    known_ranks = get_ranks()
+    for index, data in valid.items():
+        if data.get('rank_id') is not None and data['rank_id'] not in known_ranks:
+            errors.setdefault(index, {})['rank_id'] = [f'Invalid pk "{data["rank_id"]}" - object does not exist.']
+    _reject_taken(valid, errors)
+
+    created = 0
+    if valid and not dry_run:
+        hashes = hash_passwords([data.pop('password') for data in valid.values()], workers=workers)
+        users = {index: UserProfile(password=password, **data) for (index, data), password in zip(valid.items(), hashes)}
+        while valid:
+            try:
+                _insert([users[index] for index in valid], batch_size)
+                break
+            except IntegrityError as exc:
+                # A concurrent register or import took some of these since the lookup; report
+                # them like any other duplicate and insert the rest
+                if duplicate_user_error(exc) is None or not _reject_taken(valid, errors):
+                    raise
+        created = len(valid)
+        if created:
+            bump_versions(MEMBERS_NAMESPACE)
+
+    return {
+        'created': created,
+        'valid': len(valid),
+        'errors': [{'row': index, 'errors': errors[index]} for index in sorted(errors)],
+    }
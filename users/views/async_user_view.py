@@ -0,0 +1,151 @@
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.permissions import AllowAny
+
+from MMS.metrics import timed
+from users.models import UserProfile
+from users.serializers.profile_serializer import UserProfileSerializer, duplicate_user_error
+from users.serializers.member_filter_serializer import MemberFilterSerializer
+from users.serializers.member_list_serializer import member_rows, serialize_members
+from users.serializers.approve_member_serializer import ApproveMemberSerializer
+from users.tasks import WELCOME_MEMBER
+from users.utils.async_views import AsyncDispatchMixin, AsyncViewSetMixin
+from users.utils.authentication import aresolve_user
+from users.utils.custom_permissions import IsAdminOrStaff
+from users.utils.custom_response import custom_response
+from users.utils.hashing import amake_password, acheck_user_password
+from users.utils.member_export import astreaming_export_response, EXPORT_FORMATS
+from users.utils.rank_cache import get_ranks
+from users.utils.response_cache import acached_payload, acached_response, profile_namespace, MEMBERS_NAMESPACE
+from users.utils.task_queue import aenqueue
+from users.utils.throttling import IPThrottle
+from users.views.user_view import (
+    UserViewSet, UserLoginView, approval_response, generate_tokens_for_user, handle_serializer_errors, login_credentials,
+)
+
+
+# UserViewSet for ASGI deployments. The hot actions below run on the event loop with the
+# async ORM; the remaining actions are inherited and run in a worker thread.
+class AsyncUserViewSet(AsyncViewSetMixin, UserViewSet):
+    async def apaginated_members(self, members, message):
+        filters = MemberFilterSerializer(data=self.request.query_params.dict())
+        if not filters.is_valid():
+            return handle_serializer_errors(filters, 'Invalid member filters', status.HTTP_400_BAD_REQUEST)
+        members = filters.filter_queryset(members)
+
+        async def abuild():
+            page = await sync_to_async(self.paginate_queryset)(member_rows(members))
+            ranks = await sync_to_async(get_ranks)()
+            with timed('serialize'):
+                return self.paginator.get_paginated_data(serialize_members(page, ranks))
+
+        key = f'{self.action}:{self.request.build_absolute_uri()}'
+        return await acached_response(self.request, key, [MEMBERS_NAMESPACE], abuild, message)
+
+    @action(detail=False, methods=['post'], permission_classes=[AllowAny],
+            throttle_classes=[IPThrottle], throttle_scope='register')
+    async def register(self, request):
+        serializer = UserProfileSerializer(data=request.data)
+        # Validation may fill the rank cache from the database on a miss
+        if not await sync_to_async(serializer.is_valid)():
+            return handle_serializer_errors(serializer, 'Failed to register user', status.HTTP_400_BAD_REQUEST)
+
+        try:
+            serializer.instance = await UserProfile.objects.acreate_user(**serializer.validated_data)
+        except IntegrityError as e:
+            error = duplicate_user_error(e)
+            if error is None:
+                raise
+            return custom_response(str(error), status.HTTP_400_BAD_REQUEST)
+        await aenqueue(WELCOME_MEMBER, {'user_id': serializer.instance.pk}, key=f'welcome:{serializer.instance.pk}')
+        data = {
+            # Rank names come from the rank cache, which may need a query to refill
+            'user': await sync_to_async(lambda: serializer.data)(),
+            'tokens': generate_tokens_for_user(serializer.instance),
+        }
+        return custom_response('User registered successfully', status.HTTP_201_CREATED, data=data)
+
+    @action(detail=False, methods=['get'])
+    async def profile(self, request):
+        user = request.user
+
+        async def abuild():
+            profile = await aresolve_user(user)
+            with timed('serialize'):
+                return await sync_to_async(lambda: UserProfileSerializer(profile).data)()
+
+        return await acached_response(request, f'profile:{user.pk}', [profile_namespace(user.pk)],
+                                      abuild, 'Profile fetched successfully')
+
+    @extend_schema(
+        request=ApproveMemberSerializer,
+    )
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminOrStaff])
+    async def approve_member(self, request):
+        serializer = ApproveMemberSerializer(data=request.data)
+        if not serializer.is_valid():
+            return custom_response('user_id is required', status.HTTP_400_BAD_REQUEST)
+
+        user_id = serializer.validated_data['user_id']
+        return approval_response((await UserProfile.objects.aapprove_members([user_id]))[user_id])
+
+    @extend_schema(
+        parameters=[MemberFilterSerializer],
+    )
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminOrStaff])
+    async def all_members(self, request):
+        members = UserProfile.objects.all()
+        return await self.apaginated_members(members, 'All members fetched successfully')
+
+    @extend_schema(
+        parameters=[MemberFilterSerializer],
+    )
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminOrStaff])
+    async def approved_members(self, request):
+        members = UserProfile.objects.filter(is_approved=True)
+        return await self.apaginated_members(members, 'Approved members fetched successfully')
+
+    @extend_schema(
+        parameters=[MemberFilterSerializer],
+    )
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminOrStaff])
+    async def new_members(self, request):
+        members = UserProfile.objects.filter(is_approved=False)
+        return await self.apaginated_members(members, 'New members fetched successfully')
+
+    @extend_schema(
+        parameters=[OpenApiParameter('file_format', str, enum=list(EXPORT_FORMATS), description='Defaults to json')],
+    )
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminOrStaff])
+    async def export_members(self, request):
+        export_format = request.query_params.get('file_format', 'json')
+        if export_format not in EXPORT_FORMATS:
+            return custom_response('Invalid export format', status.HTTP_400_BAD_REQUEST)
+
+        members = UserProfile.objects.all()
+        return astreaming_export_response(members, export_format, 'All members exported successfully', status.HTTP_200_OK)
+
+
+class AsyncUserLoginView(AsyncDispatchMixin, UserLoginView):
+    async def post(self, request, *args, **kwargs):
+        username, password = login_credentials(request)
+        if not username or not password:
+            return custom_response('Username and password are required', status.HTTP_400_BAD_REQUEST)
+
+        user = await UserProfile.objects.filter(username=username).afirst()
+        if user is None:
+            # Hash anyway so unknown usernames take as long as wrong passwords.
+            await amake_password(password)
+            return custom_response('Invalid credentials', status.HTTP_401_UNAUTHORIZED)
+        if not await acheck_user_password(user, password) or not user.is_active:
+            return custom_response('Invalid credentials', status.HTTP_401_UNAUTHORIZED)
+
+        data = {
+            'tokens': generate_tokens_for_user(user),
+            'user': await acached_payload(f'profile:{user.pk}', [profile_namespace(user.pk)],
+                                          sync_to_async(lambda: UserProfileSerializer(user).data)),
+        }
+        return custom_response('Login successful', status.HTTP_200_OK, data=data)
@@ -1,8 +1,19 @@
+from drf_spectacular.utils import extend_schema
+from rest_framework import status
+from rest_framework.permissions import AllowAny
 from rest_framework.views import APIView
-from users.models.user_rank_model import UserRank
+
+from users.serializers.rank_serializer import UserRankSerializer
+from users.utils.custom_response import custom_response
+from users.utils.rank_cache import get_ranks
 
 
 class RankView(APIView):
+    permission_classes = [AllowAny]
 
+    @extend_schema(
+        responses=UserRankSerializer(many=True),
+    )
     def get(self, request):
-        ranks = UserRank.objects.all()
\ No newline at end of file
+        ranks = list(get_ranks().values())
+        return custom_response('Ranks fetched successfully', status.HTTP_200_OK, data=ranks)
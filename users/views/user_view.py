@@ -1,46 +1,94 @@
+from collections.abc import Mapping
+
+from django.contrib.auth.hashers import make_password
 from rest_framework import viewsets, mixins, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from rest_framework_simplejwt.tokens import RefreshToken, AccessToken
-from rest_framework_simplejwt.views import TokenObtainPairView
-from drf_spectacular.utils import extend_schema
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
-from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.parsers import MultiPartParser, FormParser
 
+from MMS.metrics import timed
 from users.models import UserProfile
-from users.serializers.profile_serializer import UserProfileSerializer, UserProfileUpdateSerializer
-from users.serializers.approve_member_serializer import ApproveMemberSerializer
+from users.serializers.profile_serializer import UserProfileSerializer, UserProfileUpdateSerializer, DuplicateUserError
+from users.serializers.member_filter_serializer import MemberFilterSerializer
+from users.serializers.member_list_serializer import member_rows, serialize_members
+from users.serializers.token_serializer import MemberTokenObtainPairSerializer, MemberTokenRefreshSerializer
+from users.serializers.import_serializer import UserImportSerializer
+from users.serializers.approve_member_serializer import ApproveMemberSerializer, BulkApproveMemberSerializer
+from users.managers.managers import APPROVED, ALREADY_APPROVED, NOT_FOUND
+from users.tasks import WELCOME_MEMBER
 from users.utils.custom_response import custom_response
 from users.utils.custom_permissions import IsAdminOrStaff, IsAdmin
+from users.utils.authentication import resolve_user
+from users.utils.tokens import MemberRefreshToken
+from users.utils.pagination import MemberCursorPagination
+from users.utils.renderers import EnvelopeJSONParser
+from users.utils.response_cache import cached_payload, cached_response, profile_namespace, MEMBERS_NAMESPACE
+from users.utils.member_stats import get_stats
+from users.utils.member_export import streaming_export_response, EXPORT_FORMATS
+from users.utils.task_queue import enqueue
+from users.utils.throttling import IPThrottle, UsernameThrottle
 
 def handle_serializer_errors(serializer, error_msg, status_code):
     return custom_response(error_msg, status_code, data=serializer.errors)
 
+def login_credentials(request):
+    """(username, password) from the body, with None for anything that isn't a string"""
+    data = request.data if isinstance(request.data, Mapping) else {}
+    username, password = data.get(UserProfile.USERNAME_FIELD), data.get('password')
+    return (username if isinstance(username, str) else None,
+            password if isinstance(password, str) else None)
+
+def approval_response(outcome):
+    if outcome == NOT_FOUND:
+        return custom_response('User not found', status.HTTP_404_NOT_FOUND)
+    if outcome == ALREADY_APPROVED:
+        return custom_response('User is already approved', status.HTTP_400_BAD_REQUEST)
+    return custom_response('User profile approved successfully', status.HTTP_200_OK)
+
 def generate_tokens_for_user(user):
-    refresh = RefreshToken.for_user(user)
-    access = AccessToken.for_user(user)
+    refresh = MemberRefreshToken.for_user(user)
     return {
         'refresh': str(refresh),
-        'access': str(access),
+        'access': str(refresh.access_token),
     }
 
 class UserViewSet(viewsets.GenericViewSet):
     queryset = UserProfile.objects.all()
     serializer_class = UserProfileSerializer
     permission_classes = [IsAuthenticated]
-    parser_classes = [JSONParser, MultiPartParser, FormParser]
+    parser_classes = [EnvelopeJSONParser, MultiPartParser, FormParser]
+    pagination_class = MemberCursorPagination
     http_method_names = ['post', 'get', 'put']
-    @action(detail=False, methods=['post'], permission_classes=[AllowAny])
-    def register(self, request):
-        email = request.data.get('email')
-        if UserProfile.objects.filter(email=email).exists():
-            return custom_response('Email already registered', status.HTTP_400_BAD_REQUEST)
+    throttle_scope = None  # set per action for the unauthenticated ones
+
+    def paginated_members(self, members, message):
+        filters = MemberFilterSerializer(data=self.request.query_params.dict())
+        if not filters.is_valid():
+            return handle_serializer_errors(filters, 'Invalid member filters', status.HTTP_400_BAD_REQUEST)
+        members = filters.filter_queryset(members)
+
+        def build():
+            page = self.paginate_queryset(member_rows(members))
+            with timed('serialize'):
+                return self.paginator.get_paginated_data(serialize_members(page))
+
+        key = f'{self.action}:{self.request.build_absolute_uri()}'
+        return cached_response(self.request, key, [MEMBERS_NAMESPACE], build, message)
 
+    @action(detail=False, methods=['post'], permission_classes=[AllowAny],
+            throttle_classes=[IPThrottle], throttle_scope='register')
+    def register(self, request):
         serializer = UserProfileSerializer(data=request.data)
         if serializer.is_valid():
-            user = serializer.save()
+            try:
+                user = serializer.save()
+            except DuplicateUserError as e:
+                return custom_response(str(e), status.HTTP_400_BAD_REQUEST)
+            enqueue(WELCOME_MEMBER, {'user_id': user.pk}, key=f'welcome:{user.pk}')
             tokens = generate_tokens_for_user(user)
             data = {
                 'user': serializer.data,
@@ -52,15 +100,22 @@ class UserViewSet(viewsets.GenericViewSet):
 
     @action(detail=False, methods=['get'])
     def profile(self, request):
-        serializer = UserProfileSerializer(request.user)
-        return custom_response('Profile fetched successfully', status.HTTP_200_OK, data=serializer.data)
+        user = request.user
+
+        def build():
+            profile = resolve_user(user)
+            with timed('serialize'):
+                return UserProfileSerializer(profile).data
+
+        return cached_response(request, f'profile:{user.pk}', [profile_namespace(user.pk)],
+                               build, 'Profile fetched successfully')
 
     @extend_schema(
         request=UserProfileUpdateSerializer,
     )
     @action(detail=False, methods=['put'])
     def update_profile(self, request):
-        user = request.user
+        user = resolve_user(request.user)
         serializer = UserProfileUpdateSerializer(user, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
@@ -76,67 +131,145 @@ class UserViewSet(viewsets.GenericViewSet):
 
         serializer = UserProfileSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            try:
+                serializer.save()
+            except DuplicateUserError as e:
+                return custom_response(str(e), status.HTTP_400_BAD_REQUEST)
             return custom_response(f'{role.capitalize()} created successfully', status.HTTP_201_CREATED, data=serializer.data)
 
         return handle_serializer_errors(serializer, 'Failed to create user', status.HTTP_400_BAD_REQUEST)
 
+    @extend_schema(
+        request=UserImportSerializer,
+    )
+    @action(detail=False, methods=['post'], permission_classes=[IsAdmin])
+    def import_users(self, request):
+        # Rarely used; loaded on demand to keep it out of worker start-up
+        from users.utils.user_import import import_users, parse_upload, ImportFormatError
+
+        upload = request.FILES.get('file')
+        try:
+            if upload:
+                rows = parse_upload(upload.read(), upload.name)
+            else:
+                rows = request.data if isinstance(request.data, list) else request.data.get('users')
+                if not isinstance(rows, list):
+                    raise ImportFormatError('Expected a file upload or a list of users')
+        except ImportFormatError as e:
+            return custom_response(str(e), status.HTTP_400_BAD_REQUEST)
+
+        # A bare list body has nowhere to carry the flag, so it comes from the query string only
+        body_flag = '' if isinstance(request.data, list) else request.data.get('dry_run', '')
+        dry_run = str(request.query_params.get('dry_run', body_flag)).lower() in ['1', 'true']
+        report = import_users(rows, dry_run=dry_run)
+        if not report['valid']:
+            return custom_response('Failed to import users', status.HTTP_400_BAD_REQUEST, data=report)
+        status_code = status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED
+        return custom_response(f"{report['valid']} users imported successfully", status_code, data=report)
+
     @extend_schema(
         request=ApproveMemberSerializer,
     )
     @action(detail=False, methods=['post'], permission_classes=[IsAdminOrStaff])
     def approve_member(self, request):
-        user_id = request.data.get('user_id')
-        if not user_id:
+        serializer = ApproveMemberSerializer(data=request.data)
+        if not serializer.is_valid():
             return custom_response('user_id is required', status.HTTP_400_BAD_REQUEST)
-        try:
-            user = UserProfile.objects.get(id=request.data.get('user_id'))
 
-            if user.is_approved:
-                return custom_response('User is already approved', status.HTTP_400_BAD_REQUEST)
+        user_id = serializer.validated_data['user_id']
+        return approval_response(UserProfile.objects.approve_members([user_id])[user_id])
 
-            user.is_approved = True
-            user.save()
-            return custom_response('User profile approved successfully', status.HTTP_200_OK)
+    @extend_schema(
+        request=BulkApproveMemberSerializer,
+    )
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminOrStaff])
+    def approve_members(self, request):
+        serializer = BulkApproveMemberSerializer(data=request.data)
+        if not serializer.is_valid():
+            return handle_serializer_errors(serializer, 'Failed to approve members', status.HTTP_400_BAD_REQUEST)
 
-        except UserProfile.DoesNotExist:
-            return custom_response('User not found', status.HTTP_404_NOT_FOUND)
+        outcomes = UserProfile.objects.approve_members(serializer.validated_data.get('user_ids'), **serializer.get_filters())
+        data = {
+            'approved_count': sum(outcome == APPROVED for outcome in outcomes.values()),
+            'results': [{'user_id': user_id, 'outcome': outcome} for user_id, outcome in outcomes.items()],
+        }
+        return custom_response('Members approved successfully', status.HTTP_200_OK, data=data)
 
+    @extend_schema(
+        parameters=[MemberFilterSerializer],
+    )
     @action(detail=False, methods=['get'], permission_classes=[IsAdminOrStaff])
     def all_members(self, request):
         members = UserProfile.objects.all()
-        serializer = UserProfileSerializer(members, many=True)
-        return custom_response('All members fetched successfully', status.HTTP_200_OK, data=serializer.data)
+        return self.paginated_members(members, 'All members fetched successfully')
 
+    @extend_schema(
+        parameters=[MemberFilterSerializer],
+    )
     @action(detail=False, methods=['get'], permission_classes=[IsAdminOrStaff])
     def approved_members(self, request):
         members = UserProfile.objects.filter(is_approved=True)
-        serializer = UserProfileSerializer(members, many=True)
-        return custom_response('Approved members fetched successfully', status.HTTP_200_OK, data=serializer.data)
+        return self.paginated_members(members, 'Approved members fetched successfully')
 
+    @extend_schema(
+        parameters=[MemberFilterSerializer],
+    )
     @action(detail=False, methods=['get'], permission_classes=[IsAdminOrStaff])
     def new_members(self, request):
-        members = UserProfile.objects.filter(is_approved=True)
-        serializer = UserProfileSerializer(members, many=True)
-        return custom_response('New members fetched successfully', status.HTTP_200_OK, data=serializer.data)
+        members = UserProfile.objects.filter(is_approved=False)
+        return self.paginated_members(members, 'New members fetched successfully')
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminOrStaff])
+    def stats(self, request):
+        return custom_response('Member statistics fetched successfully', status.HTTP_200_OK, data=get_stats())
+
+    @extend_schema(
+        parameters=[OpenApiParameter('file_format', str, enum=list(EXPORT_FORMATS), description='Defaults to json')],
+    )
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminOrStaff])
+    def export_members(self, request):
+        export_format = request.query_params.get('file_format', 'json')
+        if export_format not in EXPORT_FORMATS:
+            return custom_response('Invalid export format', status.HTTP_400_BAD_REQUEST)
+
+        members = UserProfile.objects.all()
+        return streaming_export_response(members, export_format, 'All members exported successfully', status.HTTP_200_OK)
 
 class UserLoginView(TokenObtainPairView):
-    serializer_class = TokenObtainPairSerializer
+    serializer_class = MemberTokenObtainPairSerializer
+    # Checked in initial(), so throttled attempts never reach password hashing or the database
+    throttle_classes = [IPThrottle, UsernameThrottle]
+    throttle_scope = 'login'
 
     def post(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.data)
+        username, password = login_credentials(request)
+        if not username or not password:
+            return custom_response('Username and password are required', status.HTTP_400_BAD_REQUEST)
+
+        try:
+            user = UserProfile.objects.get(username=username)
+        except UserProfile.DoesNotExist:
+            # Hash anyway so unknown usernames take as long as wrong passwords.
+            make_password(password)
+            return custom_response('Invalid credentials', status.HTTP_401_UNAUTHORIZED)
+        if not user.check_password(password) or not user.is_active:
+            return custom_response('Invalid credentials', status.HTTP_401_UNAUTHORIZED)
 
+        data = {
+            'tokens': generate_tokens_for_user(user),
+            # Shares the GET /users/profile/ cache entry, so the app's next profile fetch is a hit
+            'user': cached_payload(f'profile:{user.pk}', [profile_namespace(user.pk)],
+                                   lambda: UserProfileSerializer(user).data),
+        }
+        return custom_response('Login successful', status.HTTP_200_OK, data=data)
+
+class MemberTokenRefreshView(TokenRefreshView):
+    serializer_class = MemberTokenRefreshSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
         try:
             serializer.is_valid(raise_exception=True)
-            tokens = serializer.validated_data
-            user = serializer.user
-            user_serializer = UserProfileSerializer(user)
-            data = {
-                "tokens": tokens,
-                "user": user_serializer.data,
-            }
-            return custom_response("Login successful", status.HTTP_200_OK, data=data)
-        except AuthenticationFailed:
-            return custom_response("Invalid credentials", status.HTTP_401_UNAUTHORIZED)
-        except Exception as e:
-            return custom_response("An error occurred", status.HTTP_400_BAD_REQUEST, data={"error": str(e)})
\ No newline at end of file
+        except TokenError as e:
+            raise InvalidToken(e.args[0]) from e
+        return custom_response('Token refreshed successfully', status.HTTP_200_OK, data={'tokens': serializer.validated_data})